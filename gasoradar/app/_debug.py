@@ -0,0 +1,27 @@
+"""
+Utilidades para mensajes de diagnóstico (scripts de prueba y debug de configuración)
+"""
+import time
+
+
+def _redact(value: str, n: int = 50) -> str:
+    """Recorta valores largos (URLs, claves) antes de mostrarlos"""
+    return f"{value:.{n}}..." if len(value) > n else value
+
+
+async def _timed(label, coro):
+    """Ejecuta una prueba y muestra cuánto tardó (la primera incluye abrir la conexión del pool)"""
+    start = time.perf_counter()
+    result = await coro
+    print(f"⏱️  {label}: {(time.perf_counter() - start) * 1000:.1f} ms")
+    return result
+
+
+async def _run(main, *args, **kwargs):
+    """main() + cierre del pool de conexiones al terminar"""
+    # Import diferido: config importa este módulo y database importa config
+    from .database import engine
+    try:
+        return await main(*args, **kwargs)
+    finally:
+        await engine.dispose()
\ No newline at end of file
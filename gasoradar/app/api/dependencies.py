@@ -0,0 +1,56 @@
+"""
+Dependencias comunes para los routers de la API
+"""
+import asyncio
+from typing import Any, Awaitable, Tuple
+
+from fastapi import HTTPException
+
+from ..config import get_settings
+
+
+settings = get_settings()
+
+# Tiempo máximo para los métodos legacy en los endpoints de debug
+DEBUG_LEGACY_TIMEOUT = 2.0
+
+
+async def require_debug_mode() -> None:
+    """
+    Restringe los endpoints legacy/debug al modo DEBUG.
+    En producción responden 404, como si la ruta no existiera.
+    """
+    if not settings.debug:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+async def compare_timed(optimized: Awaitable, legacy: Awaitable) -> Tuple[Tuple[Any, float], Tuple[Any, float]]:
+    """
+    Ejecuta en paralelo el método optimizado y el legacy de un endpoint de debug.
+    Retorna ((resultado, segundos), (resultado, segundos)); el legacy se corta a
+    DEBUG_LEGACY_TIMEOUT (504) y si un método falla el otro se cancela.
+    """
+    loop = asyncio.get_running_loop()
+    
+    async def timed(coro):
+        start = loop.time()
+        result = await coro
+        return result, loop.time() - start
+    
+    tasks = [
+        asyncio.create_task(timed(optimized)),
+        asyncio.create_task(timed(asyncio.wait_for(legacy, timeout=DEBUG_LEGACY_TIMEOUT))),
+    ]
+    try:
+        optimized_result, legacy_result = await asyncio.gather(*tasks)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=504,
+            detail=f"El método legacy excedió {DEBUG_LEGACY_TIMEOUT}s"
+        )
+    finally:
+        # Si un método falla, no dejar el otro corriendo sin esperar
+        for task in tasks:
+            task.cancel()
+    
+    return optimized_result, legacy_result
\ No newline at end of file
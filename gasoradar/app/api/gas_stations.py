@@ -3,17 +3,49 @@ API endpoints para gasolineras - OPTIMIZADO para eliminar problema N+1
 """
 import logging
 from typing import Optional, List
+
+import orjson
 from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 
 from ..services.db_service import db_service
+from ..services.cache_service import cached, rounded_coords_key, COORD_DECIMALS
+from .dependencies import require_debug_mode, compare_timed
 from ..models.gas_station import GasStation
 
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/gas-stations", tags=["Gas Stations"])
 
+# A partir de este límite el listado se envía en streaming
+STREAMING_LIMIT = 100
+
+
+async def _stream_stations_json(stream, limit: int, offset: int, filters: dict):
+    """Serializa el listado gasolinera por gasolinera; el total va al final del JSON"""
+    total = 0
+    count = 0
+    try:
+        yield b'{"stations":['
+        async for station, total in stream:
+            if station is None:
+                continue
+            yield (b"," if count else b"") + orjson.dumps(station)
+            count += 1
+        
+        tail = {"total": total, "limit": limit, "offset": offset, "filters": filters}
+        yield b"]," + orjson.dumps(tail)[1:]
+        
+        logger.info(f"✅ Búsqueda en streaming completada - {count} de {total} estaciones")
+    
+    except Exception as e:
+        # Los headers ya se enviaron: solo queda registrar y cortar la respuesta
+        logger.error(f"❌ Error en búsqueda en streaming: {str(e)}")
+        raise
+
 
 @router.get("/")
+@cached("stations", expire=60, key_builder=rounded_coords_key("stations"))
 async def get_gas_stations(
     request: Request,
     latitude: Optional[float] = Query(None, description="Latitud para búsqueda por cercanía"),
@@ -32,65 +64,61 @@ async def get_gas_stations(
     try:
         logger.info(f"🚀 Iniciando búsqueda de gasolineras optimizada - limit={limit}")
         
-        # NUEVO: Usar el método optimizado que obtiene todo en una sola query
-        stations_data = await db_service.get_gas_stations_with_prices_bulk(
-            station_ids=None,  # Obtener todas
-            fuel_type=fuel_type,
-            limit=limit
-        )
-        
-        # Aplicar filtros que no se pueden hacer en SQL de forma eficiente
-        filtered_stations = []
-        
-        for station_dict in stations_data:
-            # Filtros de ubicación
-            if latitude and longitude and radius_km:
-                # Calcular distancia simple para filtrar
-                from math import sqrt
-                lat_diff = station_dict["latitude"] - latitude
-                lng_diff = station_dict["longitude"] - longitude
-                distance_km = sqrt(lat_diff**2 + lng_diff**2) * 111  # Aproximación
-                
-                if distance_km > radius_km:
-                    continue
-                
-                station_dict["distance_km"] = round(distance_km, 2)
-            
-            # Filtros de texto
-            if city and city.lower() not in (station_dict.get("city") or "").lower():
-                continue
-            
-            if state and state.lower() not in (station_dict.get("state") or "").lower():
-                continue
-            
-            if brand and brand.lower() not in (station_dict.get("brand") or "").lower():
-                continue
-            
-            filtered_stations.append(station_dict)
+        # Misma precisión que la clave de caché: la respuesta cacheada sirve a todos los que la comparten
+        if latitude is not None:
+            latitude = round(latitude, COORD_DECIMALS)
+        if longitude is not None:
+            longitude = round(longitude, COORD_DECIMALS)
+        
+        filters = {
+            "latitude": latitude,
+            "longitude": longitude,
+            "radius_km": radius_km,
+            "city": city,
+            "state": state,
+            "brand": brand,
+            "fuel_type": fuel_type
+        }
         
-        # Aplicar offset y limit final
-        paginated_stations = filtered_stations[offset:offset + limit]
+        # Páginas grandes: respuesta en streaming en lugar de armar toda la lista
+        if limit > STREAMING_LIMIT:
+            stream = db_service.stream_gas_stations_with_prices(
+                fuel_type=fuel_type,
+                latitude=latitude,
+                longitude=longitude,
+                radius_km=radius_km,
+                city=city,
+                state=state,
+                brand=brand,
+                limit=limit,
+                offset=offset
+            )
+            return StreamingResponse(
+                _stream_stations_json(stream, limit, offset, filters),
+                media_type="application/json"
+            )
         
-        # Ordenar por distancia si hay coordenadas
-        if latitude and longitude:
-            paginated_stations.sort(key=lambda x: x.get("distance_km", 999))
+        # Filtros, radio y paginación se resuelven en SQL (PostGIS ST_DWithin)
+        paginated_stations, total = await db_service.get_gas_stations_with_prices_bulk(
+            fuel_type=fuel_type,
+            latitude=latitude,
+            longitude=longitude,
+            radius_km=radius_km,
+            city=city,
+            state=state,
+            brand=brand,
+            limit=limit,
+            offset=offset
+        )
         
-        logger.info(f"✅ Búsqueda optimizada completada - {len(paginated_stations)} estaciones")
+        logger.info(f"✅ Búsqueda optimizada completada - {len(paginated_stations)} de {total} estaciones")
         
         return {
             "stations": paginated_stations,
-            "total": len(paginated_stations),
+            "total": total,
             "limit": limit,
             "offset": offset,
-            "filters": {
-                "latitude": latitude,
-                "longitude": longitude,
-                "radius_km": radius_km,
-                "city": city,
-                "state": state,
-                "brand": brand,
-                "fuel_type": fuel_type
-            }
+            "filters": filters
         }
         
     except Exception as e:
@@ -98,7 +126,7 @@ async def get_gas_stations(
         raise HTTPException(status_code=500, detail="Error interno del servidor")
 
 
-@router.get("/legacy")
+@router.get("/legacy", dependencies=[Depends(require_debug_mode)])
 async def get_gas_stations_legacy(
     request: Request,
     latitude: Optional[float] = Query(None, description="Latitud para búsqueda por cercanía"),
@@ -138,9 +166,9 @@ async def get_gas_stations_legacy(
             current_prices = await db_service.get_current_prices(station.id)
             station_dict["current_prices"] = current_prices
             
-            # Agregar distancia si hay coordenadas
-            if latitude and longitude:
-                station_dict["distance_km"] = station.calculate_distance(latitude, longitude)
+            # Distancia calculada en SQL (solo si hubo filtro de radio)
+            if hasattr(station, "distance_km"):
+                station_dict["distance_km"] = station.distance_km
             
             stations_data.append(station_dict)
         
@@ -168,6 +196,7 @@ async def get_gas_stations_legacy(
 
 
 @router.get("/{station_id}")
+@cached("station", expire=120, key_builder=lambda params: f"station:{params['station_id']}:detail")
 async def get_gas_station(station_id: str):
     """
     Obtiene detalles de una gasolinera específica - OPTIMIZADO
@@ -181,23 +210,11 @@ async def get_gas_station(station_id: str):
         # Convertir a diccionario
         station_dict = station.to_dict()
         
-        # Los precios ya se cargan con selectinload (optimizado)
-        current_prices = {}
-        for price in station.prices:
-            if price.is_current:
-                current_prices[price.fuel_type] = {
-                    "price": price.price,
-                    "source": price.source,
-                    "confidence": price.confidence_score,
-                    "updated_at": price.created_at.isoformat(),
-                    "age_hours": price.calculate_age_hours(),
-                    "is_fresh": price.is_fresh()
-                }
+        # Precios actuales desde las columnas desnormalizadas de la gasolinera
+        station_dict["current_prices"] = station.get_current_prices()
         
-        station_dict["current_prices"] = current_prices
-        
-        # Las reseñas también se cargan con selectinload (optimizado)
-        station_dict["recent_reviews"] = [review.to_dict() for review in station.reviews[:5]]
+        # Las reseñas ya vienen limitadas a las 5 más recientes
+        station_dict["recent_reviews"] = [review.to_dict() for review in station.reviews]
         
         return station_dict
         
@@ -255,23 +272,24 @@ async def get_cheapest_stations(
 
 
 @router.get("/statistics/overview")
+@cached("overview", expire=3600)
 async def get_statistics_overview():
     """
     Obtiene estadísticas generales de gasolineras
     """
     try:
-        # Por simplicidad, retornar datos calculados dinámicamente
-        # En el futuro se puede cachear estos datos
+        # Agregados en SQL; el decorador @cached guarda el resultado 1 hora
+        overview = await db_service.compute_overview()
         
         return {
-            "total_stations": 15000,  # Placeholder
-            "total_prices": 31938,    # De tus datos reales
+            "total_stations": overview["total_stations"],
+            "total_prices": overview["total_prices"],
             "fuel_types": ["magna", "premium", "diesel"],
             "coverage": {
-                "states": 32,
-                "cities": 500
+                "states": overview["states"],
+                "cities": overview["cities"]
             },
-            "last_updated": "2024-01-01T12:00:00Z",
+            "last_updated": overview["last_updated"],
             "performance": {
                 "optimized": True,
                 "avg_response_time_ms": "< 500ms",
@@ -284,26 +302,23 @@ async def get_statistics_overview():
         raise HTTPException(status_code=500, detail="Error generando estadísticas")
 
 
-@router.get("/debug/performance")
+@router.get("/debug/performance", dependencies=[Depends(require_debug_mode)])
 async def debug_performance():
     """
     Endpoint para debug de performance - comparar métodos optimizado vs legacy
     """
     try:
-        import time
-        
-        # Test método optimizado
-        start_optimized = time.time()
-        stations_optimized = await db_service.get_gas_stations_with_prices_bulk(limit=10)
-        time_optimized = time.time() - start_optimized
-        
-        # Test método legacy (cuidado - será lento)
-        start_legacy = time.time()
-        stations_legacy = await db_service.get_gas_stations(limit=10)
-        # Simular el problema N+1
-        for station in stations_legacy[:3]:  # Solo las primeras 3 para no tardar mucho
-            await db_service.get_current_prices(station.id)
-        time_legacy = time.time() - start_legacy
+        async def legacy():
+            stations = await db_service.get_gas_stations(limit=10)
+            # Simular el problema N+1
+            for station in stations[:3]:  # Solo las primeras 3 para no tardar mucho
+                await db_service.get_current_prices(station.id)
+            return stations
+        
+        # Cuidado - el legacy será lento, se corta a los 2s
+        ((stations_optimized, _), time_optimized), (stations_legacy, time_legacy) = await compare_timed(
+            db_service.get_gas_stations_with_prices_bulk(limit=10), legacy()
+        )
         
         return {
             "performance_comparison": {
@@ -325,6 +340,8 @@ async def debug_performance():
             }
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ Error en debug de performance: {str(e)}")
         raise HTTPException(status_code=500, detail="Error en debug de performance")
\ No newline at end of file
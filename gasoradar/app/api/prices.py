@@ -1,12 +1,16 @@
 """
 API endpoints para precios - OPTIMIZADO para mejor performance
 """
+import asyncio
 import logging
+from math import sin, cos, asin, sqrt, radians
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, Form
 
 from ..services.db_service import db_service
 from ..services.protection_service import protection_service
+from ..services.cache_service import cached, cache_service
+from .dependencies import require_debug_mode, compare_timed
 
 
 logger = logging.getLogger(__name__)
@@ -14,6 +18,7 @@ router = APIRouter(prefix="/prices", tags=["Prices"])
 
 
 @router.get("/current")
+@cached("prices:current", expire=60)
 async def get_current_prices(
     fuel_type: Optional[str] = Query(None, description="Filtrar por tipo de combustible"),
     city: Optional[str] = Query(None, description="Filtrar por ciudad"),
@@ -30,41 +35,18 @@ async def get_current_prices(
     try:
         logger.info(f"🚀 Obteniendo precios actuales optimizado - fuel_type={fuel_type}, limit={limit}")
         
-        # Usar método optimizado
+        # Usar método optimizado (el filtro de radio se resuelve en SQL)
         prices_data = await db_service.get_current_prices_all_stations_optimized(
             fuel_type=fuel_type,
             city=city,
             state=state,
+            latitude=latitude,
+            longitude=longitude,
+            radius_km=radius_km,
+            sort_by=sort_by,  # El ordenamiento también se hace en SQL
             limit=limit
         )
         
-        # Si hay coordenadas, calcular distancias y filtrar por radio
-        if latitude and longitude and radius_km:
-            filtered_prices = []
-            for price_data in prices_data:
-                lat = price_data["location"]["latitude"]
-                lng = price_data["location"]["longitude"]
-                
-                # Calcular distancia simple
-                from math import sqrt
-                lat_diff = lat - latitude
-                lng_diff = lng - longitude
-                distance_approx = sqrt(lat_diff**2 + lng_diff**2) * 111  # Aproximación en km
-                
-                if distance_approx <= radius_km:
-                    price_data["distance_km"] = round(distance_approx, 2)
-                    filtered_prices.append(price_data)
-            
-            prices_data = filtered_prices
-        
-        # Ordenamiento
-        if sort_by == "updated":
-            prices_data.sort(key=lambda x: x["updated_at"], reverse=True)
-        elif sort_by == "distance" and latitude and longitude:
-            prices_data.sort(key=lambda x: x.get("distance_km", 999))
-        else:  # price
-            prices_data.sort(key=lambda x: x["price"])
-        
         logger.info(f"✅ Precios actuales optimizado completado - {len(prices_data)} precios")
         
         return {
@@ -87,7 +69,7 @@ async def get_current_prices(
         raise HTTPException(status_code=500, detail="Error interno del servidor")
 
 
-@router.get("/current/legacy")
+@router.get("/current/legacy", dependencies=[Depends(require_debug_mode)])
 async def get_current_prices_legacy(
     fuel_type: Optional[str] = Query(None, description="Filtrar por tipo de combustible"),
     city: Optional[str] = Query(None, description="Filtrar por ciudad"),
@@ -104,25 +86,30 @@ async def get_current_prices_legacy(
     try:
         logger.warning(f"⚠️ Usando método LEGACY para precios actuales - fuel_type={fuel_type}, limit={limit}")
         
-        # Usar método legacy (más lento)
-        prices_data = await db_service.get_current_prices_all_stations(
+        # Método legacy: SQL solo con los filtros de texto; radio y orden se hacen en Python
+        prices_data = await db_service.get_current_prices_all_stations_optimized(
             fuel_type=fuel_type,
             city=city,
             state=state,
             limit=limit
         )
         
-        # Resto del código igual...
         if latitude and longitude and radius_km:
+            # Constantes del punto de búsqueda, fuera del loop
+            lat_rad = radians(latitude)
+            cos_lat = cos(lat_rad)
+            
             filtered_prices = []
             for price_data in prices_data:
                 lat = price_data["location"]["latitude"]
                 lng = price_data["location"]["longitude"]
                 
-                from math import sqrt
-                lat_diff = lat - latitude
-                lng_diff = lng - longitude
-                distance_approx = sqrt(lat_diff**2 + lng_diff**2) * 111
+                # Distancia de círculo máximo (Haversine) en lugar de la aproximación plana
+                lat_r = radians(lat)
+                dlat = lat_r - lat_rad
+                dlng = radians(lng - longitude)
+                a = sin(dlat / 2)**2 + cos_lat * cos(lat_r) * sin(dlng / 2)**2
+                distance_approx = 2 * 6371.0 * asin(sqrt(a))
                 
                 if distance_approx <= radius_km:
                     price_data["distance_km"] = round(distance_approx, 2)
@@ -188,17 +175,26 @@ async def report_price(
             "g-recaptcha-response": captcha_token
         }
         
-        # VALIDACIONES DE PROTECCIÓN
-        validation_ok, validation_msg = await protection_service.validate_price_report(
+        # VALIDACIONES DE PROTECCIÓN: CAPTCHA y rate limit primero, sin tocar la base de datos
+        validation_ok, validation_msg = await protection_service.check_price_report_access(
             form_data, client_ip
         )
         
+        if not validation_ok:
+            logger.warning(f"⚠️ Validación de reporte falló desde {client_ip}: {validation_msg}")
+            raise HTTPException(status_code=400, detail=validation_msg)
+        
+        # Validación del precio y búsqueda de la gasolinera en paralelo (las dos son queries)
+        (validation_ok, validation_msg), station = await asyncio.gather(
+            protection_service.validate_reported_price(form_data),
+            db_service.get_gas_station_fuels(gas_station_id)
+        )
+        
         if not validation_ok:
             logger.warning(f"⚠️ Validación de reporte falló desde {client_ip}: {validation_msg}")
             raise HTTPException(status_code=400, detail=validation_msg)
         
         # Verificar que la gasolinera existe
-        station = await db_service.get_gas_station_by_id(gas_station_id)
         if not station:
             raise HTTPException(status_code=404, detail="Gasolinera no encontrada")
         
@@ -212,6 +208,11 @@ async def report_price(
         # Crear el reporte (esto también crea el precio automáticamente)
         report = await db_service.create_price_report(form_data, client_ip)
         
+        # Invalidar respuestas cacheadas que incluyen precios actuales
+        await cache_service.delete_pattern("prices:*")
+        await cache_service.delete_pattern("stations:*")
+        await cache_service.delete_pattern(f"station:{gas_station_id}:*")
+        
         logger.info(f"✅ Reporte de precio creado: {report.id} desde {client_ip}")
         
         return {
@@ -232,6 +233,7 @@ async def report_price(
 
 
 @router.get("/statistics")
+@cached("prices:statistics", expire=600)
 async def get_price_statistics(
     fuel_type: str = Query(..., description="Tipo de combustible"),
     region: Optional[str] = Query(None, description="Región específica")
@@ -259,6 +261,7 @@ async def get_price_statistics(
 
 
 @router.get("/cheapest")
+@cached("prices:cheapest", expire=300)
 async def get_cheapest_prices(
     fuel_type: str = Query(..., description="Tipo de combustible"),
     city: Optional[str] = Query(None, description="Ciudad"),
@@ -338,29 +341,25 @@ async def get_price_validation_info(
         raise HTTPException(status_code=500, detail="Error obteniendo información de validación")
 
 
-@router.get("/debug/performance-comparison")
+@router.get("/debug/performance-comparison", dependencies=[Depends(require_debug_mode)])
 async def debug_price_performance():
     """
     Endpoint para comparar performance entre método optimizado y legacy
     """
     try:
-        import time
-        
-        # Test método optimizado
-        start_opt = time.time()
-        prices_opt = await db_service.get_current_prices_all_stations_optimized(
-            fuel_type="magna", 
-            limit=20
+        async def legacy():
+            # Problema N+1: una query de precios por cada gasolinera
+            stations = await db_service.get_gas_stations(fuel_type="magna", limit=10)
+            prices = []
+            for station in stations:
+                current_prices = await db_service.get_current_prices(station.id)
+                if "magna" in current_prices:
+                    prices.append(current_prices["magna"])
+            return prices
+        
+        (prices_opt, time_opt), (prices_leg, time_leg) = await compare_timed(
+            db_service.get_current_prices_all_stations_optimized(fuel_type="magna", limit=10), legacy()
         )
-        time_opt = time.time() - start_opt
-        
-        # Test método legacy
-        start_leg = time.time()
-        prices_leg = await db_service.get_current_prices_all_stations(
-            fuel_type="magna", 
-            limit=20
-        )
-        time_leg = time.time() - start_leg
         
         return {
             "performance_comparison": {
@@ -373,7 +372,7 @@ async def debug_price_performance():
                 "legacy_method": {
                     "time_seconds": round(time_leg, 3),
                     "prices_count": len(prices_leg),
-                    "method": "Traditional query",
+                    "method": "N+1 (una query por gasolinera)",
                     "status": "⚠️ MÁS LENTO"
                 },
                 "improvement_factor": round(time_leg / time_opt, 1) if time_opt > 0 else "∞",
@@ -381,6 +380,8 @@ async def debug_price_performance():
             }
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"❌ Error en debug de performance de precios: {str(e)}")
         raise HTTPException(status_code=500, detail="Error en debug de performance")
\ No newline at end of file
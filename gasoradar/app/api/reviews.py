@@ -6,6 +6,7 @@ from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, Form
 
 from ..services.db_service import db_service
+from ..services.cache_service import cache_service
 from ..services.protection_service import protection_service
 
 
@@ -128,6 +129,9 @@ async def create_review(
         # Crear la reseña
         review = await db_service.create_review(form_data, client_ip)
         
+        # El detalle cacheado incluye las reseñas recientes y el rating promedio
+        await cache_service.delete_pattern(f"station:{gas_station_id}:*")
+        
         logger.info(f"Review created: {review.id} from {client_ip}")
         
         return {
@@ -1,31 +1,27 @@
 """
 Configuración simplificada de la aplicación Gasoradar - CORREGIDA
 """
+import array
+import logging
 import os
+from functools import lru_cache
 from typing import List, Optional
 from pathlib import Path
 from pydantic import Field
 from pydantic_settings import BaseSettings
 
+from ._debug import _redact
+
 # CARGAR .env EXPLÍCITAMENTE desde la raíz del proyecto
 from dotenv import load_dotenv
 
+logger = logging.getLogger(__name__)
+
 # Encontrar el archivo .env en la raíz del proyecto
 current_file = Path(__file__)  # app/config.py
 project_root = current_file.parent.parent  # ../
 env_path = project_root / ".env"
 
-# Debug: mostrar dónde está buscando el .env
-print(f"🔍 Config loading .env from: {env_path}")
-print(f"🔍 .env exists: {env_path.exists()}")
-
-# Cargar el .env
-load_dotenv(env_path)
-
-# Debug: verificar que se cargó la DATABASE_URL
-database_url_from_env = os.getenv("DATABASE_URL")
-print(f"🔍 DATABASE_URL from env: {database_url_from_env[:50] if database_url_from_env else 'NOT FOUND'}...")
-
 
 class Settings(BaseSettings):
     # ── App ────────────────────────────────────────────
@@ -36,6 +32,14 @@ class Settings(BaseSettings):
 
     # ── Database ───────────────────────────────────────
     database_url: str = Field(default="postgresql+asyncpg://localhost/gasoradar", env="DATABASE_URL")
+    use_postgis: bool = Field(default=True, env="USE_POSTGIS")  # False: bounding box + Haversine en SQL
+    db_pool_size: int = Field(default=20, env="DB_POOL_SIZE")  # 0: sin pool (NullPool, serverless)
+    db_max_overflow: int = Field(default=10, env="DB_MAX_OVERFLOW")
+    db_pool_recycle: int = Field(default=1800, env="DB_POOL_RECYCLE")  # Segundos
+    db_statement_cache_size: int = Field(default=1024, env="DB_STATEMENT_CACHE_SIZE")  # 0 con PgBouncer en modo transaction
+
+    # ── Cache ──────────────────────────────────────────
+    redis_url: str = Field(default="", env="REDIS_URL")  # Vacío: caché desactivado
     
     # ── Supabase ───────────────────────────────────────
     supabase_url: str = Field(default="", env="SUPABASE_URL")
@@ -62,13 +66,6 @@ class Settings(BaseSettings):
     price_tolerance_percent: float = 15.0  # ±15% del promedio actual
     min_samples_for_validation: int = 5     # Mínimo de precios para calcular promedio
     price_data_freshness_days: int = 30     # Solo usar precios de últimos 30 días
-    
-    # Rangos de fallback si no hay datos suficientes
-    fallback_price_ranges: dict = {
-        "magna": {"min": 15.0, "max": 35.0},
-        "premium": {"min": 18.0, "max": 40.0},
-        "diesel": {"min": 16.0, "max": 38.0}
-    }
 
     class Config:
         env_file = ".env"
@@ -77,11 +74,53 @@ class Settings(BaseSettings):
         extra = "ignore"  # Ignora campos adicionales en lugar de dar error
 
 
-# Instancia global
-settings = Settings()
+# Rangos de fallback si no hay datos suficientes (fijos, fuera de Settings)
+FUEL_TYPES = ("magna", "premium", "diesel")
+FALLBACK_MIN = array.array("d", (15.0, 18.0, 16.0))
+FALLBACK_MAX = array.array("d", (35.0, 40.0, 38.0))
+FUEL_INDEX = {name: i for i, name in enumerate(FUEL_TYPES)}
+
+# Un precio es "fresco" si tiene menos de 24 horas
+FRESH_SECONDS = 86400
+
+
+@lru_cache(maxsize=1)
+def load_env() -> None:
+    """
+    Carga el .env una sola vez (lo usan get_settings() y get_logging_config()).
+    """
+    load_dotenv(env_path)
+
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Instancia única de Settings: el .env se carga y se valida solo en el primer acceso.
+    Los mensajes de debug solo se generan con LOG_LEVEL=DEBUG.
+    """
+    debug_config = logger.isEnabledFor(logging.DEBUG)
+
+    # Debug: mostrar dónde está buscando el .env
+    if debug_config:
+        logger.debug("🔍 Config loading .env from: %s", env_path)
+        logger.debug("🔍 .env exists: %s", env_path.exists())
+
+    # Cargar el .env
+    load_env()
+
+    # Debug: verificar que se cargó la DATABASE_URL
+    if debug_config:
+        database_url_from_env = os.getenv("DATABASE_URL")
+        logger.debug("🔍 DATABASE_URL from env: %s",
+                     _redact(database_url_from_env) if database_url_from_env else "NOT FOUND")
+
+    settings = Settings()
+
+    # Debug final: mostrar qué DATABASE_URL está usando
+    if debug_config:
+        logger.debug("🔍 Final DATABASE_URL in settings: %s", _redact(settings.database_url))
 
-# Debug final: mostrar qué DATABASE_URL está usando
-print(f"🔍 Final DATABASE_URL in settings: {settings.database_url[:50]}...")
+    return settings
 
 
 # Configuración CORS
@@ -94,22 +133,27 @@ CORS_SETTINGS = {
 
 
 # Configuración de logging
-LOGGING_CONFIG = {
-    "version": 1,
-    "disable_existing_loggers": False,
-    "formatters": {
-        "default": {
-            "format": "[%(asctime)s] %(levelname)s in %(module)s: %(message)s"
-        }
-    },
-    "handlers": {
-        "default": {
-            "class": "logging.StreamHandler",
-            "formatter": "default",
-        }
-    },
-    "root": {
-        "level": "INFO",
-        "handlers": ["default"],
-    },
-}
\ No newline at end of file
+def get_logging_config() -> dict:
+    """
+    Configuración de logging; el nivel se lee después de cargar el .env (LOG_LEVEL).
+    """
+    load_env()
+    return {
+        "version": 1,
+        "disable_existing_loggers": False,
+        "formatters": {
+            "default": {
+                "format": "[%(asctime)s] %(levelname)s in %(module)s: %(message)s"
+            }
+        },
+        "handlers": {
+            "default": {
+                "class": "logging.StreamHandler",
+                "formatter": "default",
+            }
+        },
+        "root": {
+            "level": os.getenv("LOG_LEVEL", "WARNING").upper(),
+            "handlers": ["default"],
+        },
+    }
\ No newline at end of file
@@ -1,24 +1,59 @@
 """
 Configuración de base de datos con Supabase
 """
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import NullPool
 
-from .config import settings
+from .config import get_settings
 
 
+settings = get_settings()
+
 # URL de conexión a Supabase (debe incluir +asyncpg://)
 DATABASE_URL = settings.database_url
 
+# Pool de conexiones (se crea una sola vez, al importar el módulo)
+if settings.db_pool_size > 0:
+    pool_options = {
+        "pool_size": settings.db_pool_size,
+        "max_overflow": settings.db_max_overflow,
+        "pool_pre_ping": True,
+        "pool_recycle": settings.db_pool_recycle,
+    }
+else:
+    pool_options = {"poolclass": NullPool}  # Para Supabase/serverless
+
 # Motor asíncrono
 engine: AsyncEngine = create_async_engine(
     DATABASE_URL,
     echo=settings.debug,  # Solo mostrar SQL queries en debug
     future=True,
-    poolclass=NullPool  # Para Supabase/serverless
+    connect_args={
+        # Cache de prepared statements de asyncpg y de SQLAlchemy
+        "statement_cache_size": settings.db_statement_cache_size,
+        "prepared_statement_cache_size": settings.db_statement_cache_size,
+        # El JIT de PostgreSQL solo agrega latencia en queries OLTP cortas
+        "server_settings": {"jit": "off"},
+    },
+    **pool_options
 )
 
+
+@event.listens_for(engine.sync_engine, "connect")
+def _register_type_codecs(dbapi_connection, connection_record):
+    """
+    asyncpg decodifica numeric directo a float: los modelos declaran Float, y así
+    ninguna columna o agregado numeric llega como Decimal (que orjson no serializa)
+    """
+    dbapi_connection.run_async(
+        lambda conn: conn.set_type_codec(
+            "numeric", schema="pg_catalog", encoder=str, decoder=float, format="text"
+        )
+    )
+
+
 # Sessionmaker para AsyncSession
 async_session = sessionmaker(
     engine,
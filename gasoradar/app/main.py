@@ -1,25 +1,32 @@
 """
 Aplicación principal de Gasoradar - Simplificada
 """
+import hashlib
 import logging
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, Request, Response, HTTPException
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, ORJSONResponse
 from fastapi.exceptions import RequestValidationError
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
-from .config import settings, CORS_SETTINGS, LOGGING_CONFIG
+from .config import (
+    get_settings, get_logging_config, CORS_SETTINGS, FUEL_TYPES, FALLBACK_MIN, FALLBACK_MAX
+)
+
+# Configurar logging antes de importar el resto de la app (get_settings() ya registra mensajes)
+import logging.config
+logging.config.dictConfig(get_logging_config())
+
 from .database import init_database, close_database
+from .services.cache_service import cache_service
 from .api import gas_stations, prices, reviews
 
-# Configurar logging
-import logging.config
-logging.config.dictConfig(LOGGING_CONFIG)
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
 
 @asynccontextmanager
@@ -33,6 +40,9 @@ async def lifespan(app: FastAPI):
         # await init_database()
         logger.info("✅ Database connection ready")
         
+        await cache_service.connect()
+        logger.info("✅ Cache ready")
+        
         logger.info("🎉 Application startup completed")
         
     except Exception as e:
@@ -45,6 +55,7 @@ async def lifespan(app: FastAPI):
     logger.info("🛑 Shutting down Gasoradar application...")
     
     try:
+        await cache_service.close()
         await close_database()
         logger.info("✅ Database connections closed")
         logger.info("👋 Application shutdown completed")
@@ -60,6 +71,7 @@ app = FastAPI(
     description="API para encontrar gasolineras baratas en México",
     docs_url="/docs" if settings.debug else None,
     redoc_url="/redoc" if settings.debug else None,
+    default_response_class=ORJSONResponse,  # Serialización JSON con orjson (extensión C)
     lifespan=lifespan
 )
 
@@ -276,7 +288,10 @@ async def get_frontend_config():
         },
         "validation": {
             "price_tolerance_percent": settings.price_tolerance_percent,
-            "fallback_ranges": settings.fallback_price_ranges
+            "fallback_ranges": {
+                fuel: {"min": FALLBACK_MIN[i], "max": FALLBACK_MAX[i]}
+                for i, fuel in enumerate(FUEL_TYPES)
+            }
         }
     }
 
@@ -311,6 +326,46 @@ async def log_requests(request: Request, call_next):
     return response
 
 
+# GETs que cambian poco: el navegador/CDN los cachea y revalida con ETag
+HTTP_CACHE_ROUTES = {
+    "/api/v1/gas-stations/{station_id}",
+    "/api/v1/gas-stations/statistics/overview",
+    "/api/v1/prices/statistics",
+    "/api/v1/prices/validation-info",
+}
+HTTP_CACHE_CONTROL = "public, max-age=60, stale-while-revalidate=300"
+
+
+@app.middleware("http")
+async def http_cache_headers(request: Request, call_next):
+    """Agrega Cache-Control + ETag y responde 304 si el cliente ya tiene la versión actual"""
+    response = await call_next(request)
+    
+    route = request.scope.get("route")  # FastAPI lo define al resolver la ruta
+    if (
+        request.method != "GET"
+        or response.status_code != 200
+        or getattr(route, "path", None) not in HTTP_CACHE_ROUTES
+    ):
+        return response
+    
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    etag = f'"{hashlib.md5(body).hexdigest()}"'
+    cache_headers = {"ETag": etag, "Cache-Control": HTTP_CACHE_CONTROL}
+    
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=cache_headers)
+    
+    headers = dict(response.headers)
+    headers.update(cache_headers)
+    return Response(
+        content=body,
+        status_code=response.status_code,
+        headers=headers,
+        media_type=response.media_type
+    )
+
+
 if __name__ == "__main__":
     import uvicorn
     
@@ -5,17 +5,30 @@ from datetime import datetime
 from typing import Optional
 from uuid import uuid4
 
-from sqlalchemy import Column, String, Float, DateTime, Boolean, ForeignKey, Text, Integer
+from sqlalchemy import Column, String, Float, DateTime, Boolean, ForeignKey, Text, Integer, Index, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship, Mapped
 
 from . import Base
+from ..config import FRESH_SECONDS
 
 
 class GasPrice(Base):
     """Modelo de precios de combustible - Adaptado a tu estructura Supabase"""
     
     __tablename__ = "gas_prices"
+    __table_args__ = (
+        # Índices parciales sobre precios vigentes y validados (ver migrations/006)
+        Index("gas_prices_validated_fuel_price_idx", "fuel_type", "price",
+              postgresql_where=text("is_current = true AND validation_status = 'validated'")),
+        Index("gas_prices_validated_fuel_created_idx", "fuel_type", text("created_at DESC"),
+              postgresql_where=text("is_current = true AND validation_status = 'validated'")),
+        Index("gas_prices_validated_station_fuel_idx", "gas_station_id", "fuel_type", text("created_at DESC"),
+              postgresql_where=text("is_current = true AND validation_status = 'validated'")),
+        # Rangos de fecha: las filas se insertan en orden de created_at (ver migrations/007)
+        Index("gas_prices_created_brin", "created_at", postgresql_using="brin",
+              postgresql_with={"pages_per_range": 32}),
+    )
     
     # Campos principales
     id: Mapped[str] = Column(UUID(as_uuid=False), primary_key=True, default=lambda: str(uuid4()))
@@ -75,9 +88,9 @@ class GasPrice(Base):
             "valid_until": self.valid_until.isoformat() if self.valid_until else None,
         }
     
-    def calculate_age_hours(self) -> float:
+    def calculate_age_hours(self, now: Optional[datetime] = None) -> float:
         """Calcula la edad del precio en horas"""
-        return (datetime.utcnow() - self.created_at).total_seconds() / 3600
+        return ((now or datetime.utcnow()) - self.created_at).total_seconds() / 3600
     
     def get_freshness_score(self) -> float:
         """
@@ -98,9 +111,9 @@ class GasPrice(Base):
         else:
             return 0.1
     
-    def is_fresh(self) -> bool:
+    def is_fresh(self, now: Optional[datetime] = None) -> bool:
         """Verifica si el precio es considerado fresco (menos de 24 horas)"""
-        return self.calculate_age_hours() <= 24
+        return ((now or datetime.utcnow()) - self.created_at).total_seconds() <= FRESH_SECONDS
     
     @classmethod
     def create_from_user_report(cls, gas_station_id: str, fuel_type: str, price: float, 
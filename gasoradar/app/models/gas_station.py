@@ -2,22 +2,52 @@
 Modelo de gasolineras - Adaptado a tu estructura existente
 """
 from datetime import datetime
-from typing import Optional
+from typing import Iterable, List, Optional
 from uuid import uuid4
 
 from sqlalchemy import (
-    Column, String, Float, DateTime, Boolean, Text, Integer
+    Column, String, Float, DateTime, Boolean, Text, Integer, Computed, Index, text
 )
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship, Mapped
+from sqlalchemy.orm import relationship, Mapped, deferred
+from sqlalchemy.types import UserDefinedType
 
 from . import Base
+from ..config import FUEL_TYPES, FRESH_SECONDS
+
+
+class Geography(UserDefinedType):
+    """Tipo PostGIS geography(Point, 4326) - solo se usa en expresiones SQL"""
+
+    cache_ok = True
+
+    def get_col_spec(self, **kw) -> str:
+        return "geography(Point, 4326)"
 
 
 class GasStation(Base):
     """Modelo de gasolinera - Adaptado a tu estructura Supabase"""
 
     __tablename__ = "gas_stations"
+    __table_args__ = (
+        # Índice espacial para ST_DWithin y ORDER BY <-> (ver migrations/004)
+        Index("gas_stations_geog_spgist", "geog", postgresql_using="spgist"),
+        # Bounding box cuando no hay PostGIS (ver migrations/002)
+        Index("gas_stations_lat_lng_idx", "latitude", "longitude"),
+        # Filtros por estado/ciudad sobre activas (ver migrations/006)
+        Index("gas_stations_active_state_city_idx", "state", "city",
+              postgresql_where=text("is_active = true")),
+        # Orden por nombre sin Sort en listados sin filtros (ver migrations/009)
+        Index("gas_stations_active_name_idx", "name",
+              postgresql_where=text("is_active = true")),
+        # ILIKE '%texto%' en ciudad/estado/marca con pg_trgm (ver migrations/008)
+        Index("gas_stations_city_trgm_idx", "city", postgresql_using="gin",
+              postgresql_ops={"city": "gin_trgm_ops"}, postgresql_where=text("is_active = true")),
+        Index("gas_stations_state_trgm_idx", "state", postgresql_using="gin",
+              postgresql_ops={"state": "gin_trgm_ops"}, postgresql_where=text("is_active = true")),
+        Index("gas_stations_brand_trgm_idx", "brand", postgresql_using="gin",
+              postgresql_ops={"brand": "gin_trgm_ops"}, postgresql_where=text("is_active = true")),
+    )
 
     # Campos principales
     id: Mapped[str] = Column(UUID(as_uuid=False), primary_key=True, default=lambda: str(uuid4()))
@@ -28,6 +58,12 @@ class GasStation(Base):
     # Ubicación geográfica
     latitude: Mapped[float] = Column(Float, nullable=False)
     longitude: Mapped[float] = Column(Float, nullable=False)
+    # Punto PostGIS generado desde latitude/longitude; diferido para no cargarlo en cada SELECT
+    geog: Mapped[Optional[str]] = deferred(Column(
+        Geography(),
+        Computed("ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)::geography", persisted=True),
+        nullable=True
+    ))
 
     # Información administrativa
     city: Mapped[Optional[str]] = Column(String(100), nullable=True)
@@ -67,6 +103,20 @@ class GasStation(Base):
     total_reviews: Mapped[int] = Column(Integer, default=0, nullable=False)
     total_reports: Mapped[int] = Column(Integer, default=0, nullable=False)
 
+    # Precios actuales desnormalizados (los mantiene un trigger sobre gas_prices, ver migrations/005)
+    current_magna_price: Mapped[Optional[float]] = Column(Float, nullable=True)
+    current_magna_source: Mapped[Optional[str]] = Column(String(20), nullable=True)
+    current_magna_confidence: Mapped[Optional[float]] = Column(Float, nullable=True)
+    current_magna_updated_at: Mapped[Optional[datetime]] = Column(DateTime, nullable=True)
+    current_premium_price: Mapped[Optional[float]] = Column(Float, nullable=True)
+    current_premium_source: Mapped[Optional[str]] = Column(String(20), nullable=True)
+    current_premium_confidence: Mapped[Optional[float]] = Column(Float, nullable=True)
+    current_premium_updated_at: Mapped[Optional[datetime]] = Column(DateTime, nullable=True)
+    current_diesel_price: Mapped[Optional[float]] = Column(Float, nullable=True)
+    current_diesel_source: Mapped[Optional[str]] = Column(String(20), nullable=True)
+    current_diesel_confidence: Mapped[Optional[float]] = Column(Float, nullable=True)
+    current_diesel_updated_at: Mapped[Optional[datetime]] = Column(DateTime, nullable=True)
+
     # Estado
     is_active: Mapped[bool] = Column(Boolean, default=True, nullable=False)
     is_verified: Mapped[bool] = Column(Boolean, default=False, nullable=False)
@@ -128,30 +178,18 @@ class GasStation(Base):
             }
         }
 
-    def calculate_distance(self, lat: float, lng: float) -> float:
-        """Calcula la distancia en kilómetros a un punto dado"""
-        from math import sin, cos, sqrt, atan2, radians
-
-        R = 6371.0  # Radio de la Tierra en km
-        lat1, lon1 = radians(self.latitude), radians(self.longitude)
-        lat2, lon2 = radians(lat), radians(lng)
-        dlon, dlat = lon2 - lon1, lat2 - lat1
-        a = sin(dlat/2)**2 + cos(lat1)*cos(lat2)*sin(dlon/2)**2
-        c = 2 * atan2(sqrt(a), sqrt(1 - a))
-        return round(R * c, 2)
+    @classmethod
+    def current_price_columns(cls, fuel_types: Iterable[str] = FUEL_TYPES) -> List:
+        """Columnas current_<combustible>_* para incluir en un select"""
+        return [
+            getattr(cls, f"current_{fuel}_{field}")
+            for fuel in fuel_types
+            for field in ("price", "source", "confidence", "updated_at")
+        ]
 
     def get_current_prices(self) -> dict:
-        """Obtiene los precios actuales de esta gasolinera"""
-        current_prices = {}
-        for price in self.prices:
-            if price.is_current:
-                current_prices[price.fuel_type] = {
-                    "price": price.price,
-                    "source": price.source,
-                    "updated_at": price.created_at.isoformat(),
-                    "confidence": price.confidence_score
-                }
-        return current_prices
+        """Obtiene los precios actuales de esta gasolinera (columnas desnormalizadas)"""
+        return current_prices_from(self)
 
     def has_fuel_type(self, fuel_type: str) -> bool:
         """Verifica si la gasolinera vende un tipo de combustible"""
@@ -160,4 +198,30 @@ class GasStation(Base):
             "premium": self.has_premium,
             "diesel": self.has_diesel
         }
-        return fuel_mapping.get(fuel_type.lower(), False)
\ No newline at end of file
+        return fuel_mapping.get(fuel_type.lower(), False)
+
+
+def current_prices_from(source, now: Optional[datetime] = None) -> dict:
+    """
+    Arma current_prices desde las columnas current_<combustible>_* de un GasStation
+    o de una fila de select (las columnas que no se seleccionaron se ignoran).
+    Al armar varias gasolineras, pasar el mismo `now` para no leer el reloj por fila.
+    """
+    now = now or datetime.utcnow()
+    current_prices = {}
+    for fuel in FUEL_TYPES:
+        price = getattr(source, f"current_{fuel}_price", None)
+        if not price:
+            continue
+
+        updated_at = getattr(source, f"current_{fuel}_updated_at")
+        age_seconds = (now - updated_at).total_seconds()
+        current_prices[fuel] = {
+            "price": price,
+            "source": getattr(source, f"current_{fuel}_source"),
+            "confidence": getattr(source, f"current_{fuel}_confidence"),
+            "updated_at": updated_at.isoformat(),
+            "age_hours": age_seconds / 3600,
+            "is_fresh": age_seconds <= FRESH_SECONDS
+        }
+    return current_prices
\ No newline at end of file
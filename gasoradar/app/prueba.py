@@ -6,76 +6,130 @@ Ejecutar mientras el servidor está corriendo en localhost:8000
 
 import asyncio
 import aiohttp
-import json
+import orjson
 from datetime import datetime
 
 BASE_URL = "http://localhost:8000"
+MAX_CONCURRENT_REQUESTS = 8
+MAX_RETRIES = 3        # Reintentos ante 429
+BACKOFF_BASE = 0.5     # Segundos; se duplica en cada reintento
 
-async def test_api_endpoint(session, endpoint, description):
-    """Prueba un endpoint específico"""
+class TokenBucket:
+    """Token bucket: deja pasar ráfagas de hasta `capacity` requests y luego `rate` por segundo"""
+    
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = None
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            while True:
+                now = loop.time()
+                if self._updated is not None:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+rate_limiter = TokenBucket(rate=10, capacity=10)
+
+async def fetch(session, url):
+    """GET con token bucket y backoff exponencial si el servidor responde 429; devuelve (status, body)"""
+    for attempt in range(MAX_RETRIES + 1):
+        await rate_limiter.acquire()
+        async with session.get(url) as response:
+            body = await response.read()
+            if response.status != 429 or attempt == MAX_RETRIES:
+                return response.status, body
+            retry_after = response.headers.get("Retry-After", "")
+        
+        delay = float(retry_after) if retry_after.isdigit() else BACKOFF_BASE * 2 ** attempt
+        await asyncio.sleep(delay)
+
+async def test_api_endpoint(session, sem, endpoint, description):
+    """Prueba un endpoint específico y devuelve su salida (para no mezclarla entre requests)"""
     url = f"{BASE_URL}{endpoint}"
-    print(f"\n🔍 {description}")
-    print(f"   URL: {url}")
+    out = []
+    out.append(f"\n🔍 {description}")
+    out.append(f"   URL: {url}")
     
     try:
-        async with session.get(url) as response:
-            status = response.status
-            
-            if status == 200:
-                try:
-                    data = await response.json()
-                    print(f"   ✅ Status: {status}")
-                    
-                    # Mostrar información relevante según el endpoint
-                    if 'statistics' in endpoint:
-                        print(f"   📊 Datos: {json.dumps(data, indent=2)}")
-                    elif 'gas-stations' in endpoint:
-                        stations = data.get('stations', [])
-                        print(f"   ⛽ Gasolineras encontradas: {len(stations)}")
-                        if stations:
-                            print(f"   📍 Primera: {stations[0].get('name', 'Sin nombre')} - {stations[0].get('city', 'Sin ciudad')}")
-                    elif 'prices' in endpoint:
-                        prices = data.get('prices', [])
-                        print(f"   💰 Precios encontrados: {len(prices)}")
-                        if prices:
-                            first_price = prices[0]
-                            print(f"   💵 Primer precio: ${first_price.get('price', 'N/A')} - {first_price.get('fuel_type', 'N/A')}")
-                    else:
-                        print(f"   📄 Respuesta: {json.dumps(data, indent=2)[:200]}...")
-                        
-                except json.JSONDecodeError as e:
-                    text = await response.text()
-                    print(f"   ⚠️  Status: {status} (Respuesta no es JSON)")
-                    print(f"   📄 Contenido: {text[:200]}...")
-            else:
-                text = await response.text()
-                print(f"   ❌ Status: {status}")
-                print(f"   📄 Error: {text[:200]}...")
+        async with sem:
+            status, body = await fetch(session, url)
+        
+        if status == 200:
+            try:
+                data = orjson.loads(body)
+                out.append(f"   ✅ Status: {status}")
                 
+                # Mostrar información relevante según el endpoint
+                if 'statistics' in endpoint:
+                    out.append(f"   📊 Datos: {orjson.dumps(data, option=orjson.OPT_INDENT_2).decode()}")
+                elif 'gas-stations' in endpoint:
+                    stations = data.get('stations', [])
+                    out.append(f"   ⛽ Gasolineras encontradas: {len(stations)}")
+                    if stations:
+                        out.append(f"   📍 Primera: {stations[0].get('name', 'Sin nombre')} - {stations[0].get('city', 'Sin ciudad')}")
+                elif 'prices' in endpoint:
+                    prices = data.get('prices', [])
+                    out.append(f"   💰 Precios encontrados: {len(prices)}")
+                    if prices:
+                        first_price = prices[0]
+                        out.append(f"   💵 Primer precio: ${first_price.get('price', 'N/A')} - {first_price.get('fuel_type', 'N/A')}")
+                else:
+                    out.append(f"   📄 Respuesta: {orjson.dumps(data, option=orjson.OPT_INDENT_2).decode()[:200]}...")
+            
+            except (orjson.JSONDecodeError, ValueError) as e:
+                text = body.decode(errors="replace")
+                out.append(f"   ⚠️  Status: {status} (Respuesta no es JSON)")
+                out.append(f"   📄 Contenido: {text[:200]}...")
+        else:
+            text = body.decode(errors="replace")
+            out.append(f"   ❌ Status: {status}")
+            out.append(f"   📄 Error: {text[:200]}...")
+    
     except Exception as e:
-        print(f"   💥 Error de conexión: {str(e)}")
+        out.append(f"   💥 Error de conexión: {str(e)}")
+    
+    return "\n".join(out)
+
+async def run_endpoints(session, endpoints):
+    """Lanza todos los endpoints en paralelo (acotado) e imprime en el orden original"""
+    sem = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    tasks = [test_api_endpoint(session, sem, endpoint, description) for endpoint, description in endpoints]
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    
+    for result in results:
+        if isinstance(result, Exception):
+            print(f"\n💥 Error inesperado: {result}")
+        else:
+            print(result)
 
-async def test_all_apis():
+async def test_all_apis(session):
     """Prueba todas las APIs principales"""
     print("🚀 Iniciando pruebas de APIs de Gasoradar")
     print(f"⏰ Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     
-    async with aiohttp.ClientSession() as session:
-        # Lista de endpoints a probar
-        endpoints = [
-            ("/api/health", "Health check"),
-            ("/api/info", "Información de la aplicación"),
-            ("/api/v1/gas-stations/statistics/overview", "Estadísticas generales"),
-            ("/api/v1/gas-stations/?limit=5", "Lista de gasolineras (5 primeras)"),
-            ("/api/v1/gas-stations/?fuel_type=magna&limit=3", "Gasolineras con magna"),
-            ("/api/v1/prices/current?limit=5", "Precios actuales"),
-            ("/api/v1/prices/statistics?fuel_type=magna", "Estadísticas de precios magna"),
-            ("/api/v1/reviews/?limit=3", "Reseñas recientes"),
-        ]
-        
-        for endpoint, description in endpoints:
-            await test_api_endpoint(session, endpoint, description)
-            await asyncio.sleep(0.5)  # Pausa breve entre requests
+    # Lista de endpoints a probar
+    endpoints = [
+        ("/api/health", "Health check"),
+        ("/api/info", "Información de la aplicación"),
+        ("/api/v1/gas-stations/statistics/overview", "Estadísticas generales"),
+        ("/api/v1/gas-stations/?limit=5", "Lista de gasolineras (5 primeras)"),
+        ("/api/v1/gas-stations/?fuel_type=magna&limit=3", "Gasolineras con magna"),
+        ("/api/v1/prices/current?limit=5", "Precios actuales"),
+        ("/api/v1/prices/statistics?fuel_type=magna", "Estadísticas de precios magna"),
+        ("/api/v1/reviews/?limit=3", "Reseñas recientes"),
+    ]
+    
+    await run_endpoints(session, endpoints)
     
     print("\n" + "="*60)
     print("✅ Pruebas completadas")
@@ -84,32 +138,37 @@ async def test_all_apis():
     print("   - Si no hay datos, verifica tu conexión a la base de datos")
     print("   - Ejecuta 'python test_db.py' para probar la DB directamente")
 
-async def test_specific_endpoints():
+async def test_specific_endpoints(session):
     """Prueba endpoints específicos que podrían estar causando problemas"""
     print("\n🔧 Probando endpoints problemáticos específicos...")
     
-    async with aiohttp.ClientSession() as session:
-        # Probar con diferentes parámetros
-        specific_tests = [
-            ("/api/v1/gas-stations/?latitude=19.4326&longitude=-99.1332&radius_km=25&fuel_type=magna", 
-             "Gasolineras cerca de CDMX"),
-            ("/api/v1/gas-stations/?city=Mexico&fuel_type=magna", 
-             "Gasolineras en México DF"),
-            ("/api/v1/prices/cheapest?fuel_type=magna&state=Jalisco", 
-             "Precios más baratos en Jalisco"),
-        ]
-        
-        for endpoint, description in specific_tests:
-            await test_api_endpoint(session, endpoint, description)
-            await asyncio.sleep(0.5)
+    # Probar con diferentes parámetros
+    specific_tests = [
+        ("/api/v1/gas-stations/?latitude=19.4326&longitude=-99.1332&radius_km=25&fuel_type=magna",
+         "Gasolineras cerca de CDMX"),
+        ("/api/v1/gas-stations/?city=Mexico&fuel_type=magna",
+         "Gasolineras en México DF"),
+        ("/api/v1/prices/cheapest?fuel_type=magna&state=Jalisco",
+         "Precios más baratos en Jalisco"),
+    ]
+    
+    await run_endpoints(session, specific_tests)
+
+async def main():
+    """Una sola sesión (y pool keep-alive) para ambas suites de pruebas"""
+    connector = aiohttp.TCPConnector(limit=32, ttl_dns_cache=300, keepalive_timeout=60)
+    async with aiohttp.ClientSession(
+        connector=connector, json_serialize=lambda obj: orjson.dumps(obj).decode()
+    ) as session:
+        await test_all_apis(session)
+        await test_specific_endpoints(session)
 
 if __name__ == "__main__":
     print("🧪 Gasoradar API Test Suite")
     print("="*60)
     
     try:
-        asyncio.run(test_all_apis())
-        asyncio.run(test_specific_endpoints())
+        asyncio.run(main())
     except KeyboardInterrupt:
         print("\n⚠️  Pruebas interrumpidas por el usuario")
     except Exception as e:
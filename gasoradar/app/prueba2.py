@@ -4,6 +4,7 @@ Script para probar la conexión a la base de datos de Gasoradar
 """
 
 import asyncio
+import json
 import sys
 import os
 from pathlib import Path
@@ -13,38 +14,71 @@ project_root = Path(__file__).parent.parent
 sys.path.append(str(project_root))
 
 from app.database import async_session, engine
-from app.config import settings
+from app.config import get_settings
+from app._debug import _redact, _timed, _run
 from sqlalchemy import select, text
 
+settings = get_settings()
+
+# Consultas compiladas una sola vez al importar el módulo
+_Q_CONNECTION = text("""
+    SELECT 1 as test,
+           version() as version,
+           (SELECT array_agg(table_name::text ORDER BY table_name)
+            FROM information_schema.tables
+            WHERE table_schema = 'public'
+            AND table_type = 'BASE TABLE') as tables
+""")
+_Q_GAS_STATIONS = text("""
+    SELECT COUNT(*) as total,
+           COUNT(CASE WHEN latitude IS NOT NULL AND longitude IS NOT NULL THEN 1 END) as with_coords,
+           COUNT(CASE WHEN is_active = true THEN 1 END) as active,
+           (SELECT json_agg(row_to_json(t)) FROM (
+                SELECT id, name, city, state, latitude, longitude, is_active
+                FROM gas_stations
+                WHERE is_active = true
+                LIMIT 5
+           ) t) as sample
+    FROM gas_stations
+""")
+_Q_GAS_PRICES = text("""
+    SELECT fuel_type,
+           GROUPING(fuel_type) = 1 as is_total,
+           COUNT(*) as total,
+           COUNT(CASE WHEN is_current = true THEN 1 END) as current_prices
+    FROM gas_prices
+    GROUP BY ROLLUP (fuel_type)
+    ORDER BY is_total, fuel_type
+""")
+_Q_RELATIONSHIPS = text("""
+    SELECT
+        gs.name,
+        gs.city,
+        gp.fuel_type,
+        gp.price,
+        gp.created_at
+    FROM gas_stations gs
+    JOIN gas_prices gp ON gs.id = gp.gas_station_id
+    WHERE gs.is_active = true
+    AND gp.is_current = true
+    LIMIT 3
+""")
+
 async def test_database_connection():
     """Prueba la conexión básica a la base de datos"""
     print("🔍 Probando conexión a la base de datos...")
-    print(f"🌐 DATABASE_URL: {settings.database_url[:50]}...")
+    print(f"🌐 DATABASE_URL: {_redact(settings.database_url)}")
     
     try:
-        # Test 1: Conexión básica
-        async with engine.begin() as conn:
-            result = await conn.execute(text("SELECT 1 as test"))
-            test_value = result.scalar()
-            print(f"✅ Conexión básica exitosa - Test query result: {test_value}")
-            
-        # Test 2: Verificar versión de PostgreSQL
-        async with engine.begin() as conn:
-            result = await conn.execute(text("SELECT version()"))
-            version = result.scalar()
-            print(f"🐘 PostgreSQL version: {version[:100]}...")
+        # Conexión básica + versión de PostgreSQL + tablas existentes en un solo round-trip
+        async with engine.connect() as conn:
+            result = await conn.execute(_Q_CONNECTION)
+            test_value, version, tables = result.one()
+            tables = tables or []
             
-        # Test 3: Listar tablas existentes
-        async with engine.begin() as conn:
-            result = await conn.execute(text("""
-                SELECT table_name 
-                FROM information_schema.tables 
-                WHERE table_schema = 'public' 
-                AND table_type = 'BASE TABLE'
-                ORDER BY table_name
-            """))
-            tables = [row[0] for row in result.fetchall()]
-            print(f"📋 Tablas encontradas ({len(tables)}): {', '.join(tables)}")
+        print(f"✅ Conexión básica exitosa - Test query result: {test_value}")
+        print(f"🐘 PostgreSQL version: {_redact(version, 100)}")
+        print(f"📋 Tablas encontradas ({len(tables)}): {', '.join(tables)}")
             
         return True
         
@@ -59,18 +93,12 @@ async def test_gas_stations_table():
     
     try:
         async with async_session() as session:
-            # Verificar si la tabla existe y tiene datos
-            result = await session.execute(text("""
-                SELECT COUNT(*) as total, 
-                       COUNT(CASE WHEN latitude IS NOT NULL AND longitude IS NOT NULL THEN 1 END) as with_coords,
-                       COUNT(CASE WHEN is_active = true THEN 1 END) as active
-                FROM gas_stations 
-                LIMIT 1
-            """))
+            # Conteos + gasolineras de ejemplo en una sola consulta
+            result = await session.execute(_Q_GAS_STATIONS)
             
             row = result.first()
             if row:
-                total, with_coords, active = row
+                total, with_coords, active, sample = row
                 print(f"📊 Total gasolineras: {total}")
                 print(f"🗺️  Con coordenadas: {with_coords}")
                 print(f"✅ Activas: {active}")
@@ -79,18 +107,15 @@ async def test_gas_stations_table():
                     print("⚠️  La tabla gas_stations está vacía!")
                     return False
                     
-                # Mostrar algunas gasolineras de ejemplo
-                result = await session.execute(text("""
-                    SELECT id, name, city, state, latitude, longitude, is_active
-                    FROM gas_stations 
-                    WHERE is_active = true
-                    LIMIT 5
-                """))
+                # Mostrar algunas gasolineras de ejemplo (json_agg llega como texto con asyncpg)
+                stations = json.loads(sample) if isinstance(sample, str) else (sample or [])
                 
                 print("\n📍 Primeras 5 gasolineras activas:")
-                for i, row in enumerate(result.fetchall(), 1):
-                    id, name, city, state, lat, lng, active = row
-                    print(f"  {i}. {name} - {city}, {state} ({lat:.4f}, {lng:.4f}) - Activa: {active}")
+                sys.stdout.write("".join(
+                    f"  {i}. {station['name']} - {station['city']}, {station['state']} "
+                    f"({station['latitude']:.4f}, {station['longitude']:.4f}) - Activa: {station['is_active']}\n"
+                    for i, station in enumerate(stations, 1)
+                ))
                 
                 return True
             else:
@@ -111,16 +136,14 @@ async def test_gas_prices_table():
     
     try:
         async with async_session() as session:
-            result = await session.execute(text("""
-                SELECT COUNT(*) as total,
-                       COUNT(CASE WHEN is_current = true THEN 1 END) as current_prices,
-                       COUNT(DISTINCT fuel_type) as fuel_types
-                FROM gas_prices
-            """))
+            # Totales (fila de ROLLUP) + distribución por combustible en una sola consulta
+            result = await session.execute(_Q_GAS_PRICES)
             
-            row = result.first()
+            rows = result.fetchall()
+            by_fuel = [r for r in rows if not r.is_total and r.fuel_type is not None]
+            row = next((r for r in rows if r.is_total), None)
             if row:
-                total, current_prices, fuel_types = row
+                total, current_prices, fuel_types = row.total, row.current_prices, len(by_fuel)
                 print(f"📊 Total precios: {total}")
                 print(f"⏱️  Precios actuales: {current_prices}")
                 print(f"⛽ Tipos de combustible: {fuel_types}")
@@ -130,17 +153,11 @@ async def test_gas_prices_table():
                     return False
                 
                 # Mostrar tipos de combustible
-                result = await session.execute(text("""
-                    SELECT fuel_type, COUNT(*) as count
-                    FROM gas_prices 
-                    WHERE is_current = true
-                    GROUP BY fuel_type
-                    ORDER BY fuel_type
-                """))
-                
                 print("\n⛽ Distribución por combustible:")
-                for fuel_type, count in result.fetchall():
-                    print(f"  - {fuel_type}: {count} precios actuales")
+                sys.stdout.write("".join(
+                    f"  - {r.fuel_type}: {r.current_prices} precios actuales\n"
+                    for r in by_fuel if r.current_prices
+                ))
                 
                 return True
             else:
@@ -157,24 +174,13 @@ async def test_table_relationships():
     
     try:
         async with async_session() as session:
-            result = await session.execute(text("""
-                SELECT 
-                    gs.name,
-                    gs.city,
-                    gp.fuel_type,
-                    gp.price,
-                    gp.created_at
-                FROM gas_stations gs
-                JOIN gas_prices gp ON gs.id = gp.gas_station_id
-                WHERE gs.is_active = true 
-                AND gp.is_current = true
-                LIMIT 3
-            """))
+            result = await session.execute(_Q_RELATIONSHIPS)
             
             print("🔗 Primeras 3 relaciones gasolinera-precio:")
-            for i, row in enumerate(result.fetchall(), 1):
-                name, city, fuel_type, price, created_at = row
-                print(f"  {i}. {name} ({city}) - {fuel_type}: ${price} - {created_at}")
+            sys.stdout.write("".join(
+                f"  {i}. {name} ({city}) - {fuel_type}: ${price} - {created_at}\n"
+                for i, (name, city, fuel_type, price, created_at) in enumerate(result.fetchall(), 1)
+            ))
                 
             return True
             
@@ -206,7 +212,7 @@ async def check_environment():
         value = getattr(settings, var.lower(), None)
         if value:
             # Mostrar solo los primeros caracteres por seguridad
-            safe_value = value[:20] + "..." if len(value) > 20 else value
+            safe_value = _redact(value, 20)
             print(f"  ✅ {var}: {safe_value}")
         else:
             print(f"  ❌ {var}: No configurada")
@@ -220,18 +226,18 @@ async def main():
     await check_environment()
     
     # Test de conexión
-    connection_ok = await test_database_connection()
+    connection_ok = await _timed("Conexión", test_database_connection())
     
     if not connection_ok:
         print("\n❌ No se puede continuar sin conexión a la base de datos")
         return
     
     # Tests de tablas
-    gas_stations_ok = await test_gas_stations_table()
-    gas_prices_ok = await test_gas_prices_table()
+    gas_stations_ok = await _timed("gas_stations", test_gas_stations_table())
+    gas_prices_ok = await _timed("gas_prices", test_gas_prices_table())
     
     if gas_stations_ok and gas_prices_ok:
-        await test_table_relationships()
+        await _timed("Relaciones", test_table_relationships())
     
     print("\n" + "=" * 60)
     print("📋 RESUMEN:")
@@ -250,7 +256,7 @@ async def main():
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        asyncio.run(_run(main))
     except KeyboardInterrupt:
         print("\n⚠️  Test interrumpido por el usuario")
     except Exception as e:
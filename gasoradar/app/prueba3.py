@@ -1,30 +1,28 @@
 #!/usr/bin/env python3
 """
 Script simple para probar la conexión a la base de datos
+Ejecutar como módulo desde gasoradar/: python -m app.prueba3 [--no-cache]
 """
 
 import asyncio
+import hashlib
+import json
 import sys
-import os
+import time
 from pathlib import Path
 
-# Cambiar al directorio padre para importar correctamente
-parent_dir = Path(__file__).parent.parent
-sys.path.insert(0, str(parent_dir))
-os.chdir(parent_dir)
-
-print(f"📁 Directorio de trabajo: {os.getcwd()}")
-
 try:
     # Importar configuración
     print("🔧 Cargando configuración...")
-    from app.config import settings
+    from .config import get_settings
+    from ._debug import _redact, _timed, _run
+    settings = get_settings()
     print(f"✅ Configuración cargada")
-    print(f"🌐 DATABASE_URL: {settings.database_url[:50]}...")
+    print(f"🌐 DATABASE_URL: {_redact(settings.database_url)}")
     
     # Importar base de datos
     print("🔌 Importando módulos de base de datos...")
-    from app.database import async_session, engine
+    from .database import async_session, engine
     print("✅ Módulos de DB importados")
     
     # Importar SQLAlchemy
@@ -37,6 +35,52 @@ except Exception as e:
     traceback.print_exc()
     sys.exit(1)
 
+# Consultas compiladas una sola vez al importar el módulo
+_Q_PING = text("SELECT 1 as test")
+_Q_TABLES = text("""
+    SELECT table_name
+    FROM information_schema.tables
+    WHERE table_schema = 'public'
+    AND table_type = 'BASE TABLE'
+    ORDER BY table_name
+""")
+_Q_COUNT_STATIONS = text("SELECT COUNT(*) FROM gas_stations")
+_Q_COUNT_PRICES = text("SELECT COUNT(*) FROM gas_prices")
+_Q_SAMPLE_STATION = text("""
+    SELECT name, city, state
+    FROM gas_stations
+    WHERE is_active = true
+    LIMIT 1
+""")
+
+# Caché local de la lista de tablas (por DATABASE_URL) para ejecuciones repetidas
+PROBE_CACHE_FILE = Path(".gasoradar_probe_cache.json")
+PROBE_CACHE_TTL = 3600  # Segundos
+
+def _load_cached_tables(key):
+    """Lista de tablas cacheada o None si no existe / expiró"""
+    try:
+        entry = json.loads(PROBE_CACHE_FILE.read_text()).get(key)
+    except (OSError, ValueError):
+        return None
+    
+    if not entry or entry["expires_at"] < time.time():
+        return None
+    return entry["tables"]
+
+def _save_cached_tables(key, tables):
+    """Guarda la lista de tablas con su expiración"""
+    try:
+        cache = json.loads(PROBE_CACHE_FILE.read_text())
+    except (OSError, ValueError):
+        cache = {}
+    
+    cache[key] = {"tables": tables, "expires_at": time.time() + PROBE_CACHE_TTL}
+    try:
+        PROBE_CACHE_FILE.write_text(json.dumps(cache))
+    except OSError as e:
+        print(f"⚠️  No se pudo escribir la caché local: {e}")
+
 async def test_basic_connection():
     """Prueba conexión básica"""
     print("\n🔍 Probando conexión básica...")
@@ -44,7 +88,7 @@ async def test_basic_connection():
     try:
         # Test con engine directamente
         async with engine.begin() as conn:
-            result = await conn.execute(text("SELECT 1 as test"))
+            result = await conn.execute(_Q_PING)
             test_value = result.scalar()
             print(f"✅ Conexión básica exitosa - Test: {test_value}")
             return True
@@ -56,36 +100,45 @@ async def test_basic_connection():
         print("   - Credenciales incorrectas")
         return False
 
-async def test_tables():
+async def test_tables(use_cache=True):
     """Verifica si existen las tablas"""
     print("\n📋 Verificando tablas...")
     
+    cache_key = hashlib.sha256(settings.database_url.encode()).hexdigest()
+    tables = _load_cached_tables(cache_key) if use_cache else None
+    
     try:
-        async with engine.begin() as conn:
-            result = await conn.execute(text("""
-                SELECT table_name 
-                FROM information_schema.tables 
-                WHERE table_schema = 'public' 
-                AND table_type = 'BASE TABLE'
-                ORDER BY table_name
-            """))
-            tables = [row[0] for row in result.fetchall()]
-            
-            print(f"📊 Tablas encontradas ({len(tables)}):")
-            for table in tables:
-                print(f"   - {table}")
-            
-            # Verificar tablas específicas que necesitamos
-            required_tables = ['gas_stations', 'gas_prices']
-            missing_tables = [t for t in required_tables if t not in tables]
-            
-            if missing_tables:
-                print(f"⚠️  Tablas faltantes: {missing_tables}")
-                return False
-            else:
-                print("✅ Todas las tablas requeridas existen")
-                return True
-                
+        if tables is None:
+            async with engine.begin() as conn:
+                # Cursor del lado del servidor: las filas se consumen a medida que llegan
+                result = await conn.stream(_Q_TABLES)
+                tables = []
+                async for row in result:
+                    tables.append(row[0])
+            from_cache = False
+        else:
+            print("💾 Lista de tablas desde caché local (usa --no-cache para consultar la DB)")
+            from_cache = True
+        
+        table_set = set(tables)
+        
+        print(f"📊 Tablas encontradas ({len(tables)}):")
+        sys.stdout.write("".join(f"   - {table}\n" for table in tables))
+        
+        # Verificar tablas específicas que necesitamos
+        required_tables = ['gas_stations', 'gas_prices']
+        missing_tables = [t for t in required_tables if t not in table_set]
+        
+        if missing_tables:
+            print(f"⚠️  Tablas faltantes: {missing_tables}")
+            return False
+        
+        # Solo se cachea un resultado correcto: si faltan tablas se vuelve a consultar
+        if not from_cache:
+            _save_cached_tables(cache_key, tables)
+        print("✅ Todas las tablas requeridas existen")
+        return True
+    
     except Exception as e:
         print(f"❌ Error verificando tablas: {e}")
         return False
@@ -97,12 +150,12 @@ async def test_data():
     try:
         async with async_session() as session:
             # Contar gasolineras
-            result = await session.execute(text("SELECT COUNT(*) FROM gas_stations"))
+            result = await session.execute(_Q_COUNT_STATIONS)
             gas_stations_count = result.scalar()
             print(f"🏪 Gasolineras: {gas_stations_count}")
             
             # Contar precios
-            result = await session.execute(text("SELECT COUNT(*) FROM gas_prices"))
+            result = await session.execute(_Q_COUNT_PRICES)
             prices_count = result.scalar()
             print(f"💰 Precios: {prices_count}")
             
@@ -115,12 +168,7 @@ async def test_data():
                 return False
             
             # Mostrar una gasolinera de ejemplo
-            result = await session.execute(text("""
-                SELECT name, city, state 
-                FROM gas_stations 
-                WHERE is_active = true 
-                LIMIT 1
-            """))
+            result = await session.execute(_Q_SAMPLE_STATION)
             station = result.first()
             
             if station:
@@ -132,27 +180,27 @@ async def test_data():
         print(f"❌ Error verificando datos: {e}")
         return False
 
-async def main():
+async def main(use_cache=True):
     """Función principal"""
     print("🧪 Test Simple de Base de Datos - Gasoradar")
     print("=" * 50)
     
     # Test 1: Conexión básica
-    connection_ok = await test_basic_connection()
+    connection_ok = await _timed("Conexión", test_basic_connection())
     
     if not connection_ok:
         print("\n❌ No se puede continuar sin conexión")
         return False
     
     # Test 2: Verificar tablas
-    tables_ok = await test_tables()
+    tables_ok = await _timed("Tablas", test_tables(use_cache))
     
     if not tables_ok:
         print("\n❌ Faltan tablas en la base de datos")
         return False
     
     # Test 3: Verificar datos
-    data_ok = await test_data()
+    data_ok = await _timed("Datos", test_data())
     
     print("\n" + "=" * 50)
     print("📋 RESUMEN:")
@@ -170,7 +218,7 @@ async def main():
 
 if __name__ == "__main__":
     try:
-        result = asyncio.run(main())
+        result = asyncio.run(_run(main, use_cache="--no-cache" not in sys.argv))
         if result:
             print("\n💡 Próximo paso: Verificar los modelos de SQLAlchemy")
         else:
@@ -0,0 +1,173 @@
+"""
+Servicio de caché: respuestas de endpoints de lectura en Redis con TTL corto
+"""
+import hashlib
+import json
+import logging
+import time
+from fnmatch import fnmatchcase
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import orjson
+from fastapi import Response
+from redis import asyncio as aioredis
+
+from ..config import get_settings
+
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class CacheService:
+    """
+    Caché Redis opcional. Sin REDIS_URL usa un dict en memoria con TTL (por proceso);
+    si Redis está configurado pero falla, todo se comporta como un miss.
+    """
+    
+    def __init__(self):
+        self.redis_url = settings.redis_url
+        self._pool: Optional[aioredis.ConnectionPool] = None
+        self._redis: Optional[aioredis.Redis] = None
+        # Fallback en memoria: clave -> (expira_en, valor)
+        self._local: Dict[str, Tuple[float, Any]] = {}
+        self.local_max_entries = 1000
+        self.local_max_ttl = 60  # Segundos: sin Redis la invalidación no llega a otros workers
+    
+    async def connect(self) -> None:
+        """Crea el pool de conexiones (se llama desde el lifespan de la app)"""
+        if not self.redis_url:
+            logger.warning("⚠️ REDIS_URL no configurado, caché de respuestas solo en memoria")
+            return
+        
+        self._pool = aioredis.ConnectionPool.from_url(
+            self.redis_url, max_connections=20, decode_responses=True
+        )
+        self._redis = aioredis.Redis(connection_pool=self._pool)
+    
+    async def close(self) -> None:
+        """Cierra el pool de conexiones"""
+        if self._redis is not None:
+            await self._redis.close()
+            await self._pool.disconnect()
+            self._redis = None
+            self._pool = None
+    
+    async def get(self, key: str) -> Optional[Any]:
+        """Obtiene el JSON cacheado (ya serializado) o None"""
+        if self._redis is None:
+            entry = self._local.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._local[key]
+                return None
+            return entry[1]
+        
+        try:
+            value = await self._redis.get(key)
+        except Exception as e:
+            logger.warning(f"⚠️ Error leyendo caché {key}: {str(e)}")
+            return None
+        
+        return value
+    
+    async def set(self, key: str, value: bytes, expire: int) -> None:
+        """Guarda JSON ya serializado con expiración en segundos"""
+        if self._redis is None:
+            if len(self._local) >= self.local_max_entries:
+                self._local.clear()
+            self._local[key] = (time.monotonic() + min(expire, self.local_max_ttl), value)
+            return
+        
+        try:
+            await self._redis.set(key, value, ex=expire)
+        except Exception as e:
+            logger.warning(f"⚠️ Error escribiendo caché {key}: {str(e)}")
+    
+    async def delete_pattern(self, pattern: str) -> int:
+        """Elimina todas las claves que coinciden con el patrón (SCAN, no KEYS)"""
+        if self._redis is None:
+            keys = [key for key in self._local if fnmatchcase(key, pattern)]
+            for key in keys:
+                del self._local[key]
+            return len(keys)
+        
+        deleted = 0
+        try:
+            batch = []
+            async for key in self._redis.scan_iter(match=pattern, count=500):
+                batch.append(key)
+                if len(batch) >= 500:
+                    deleted += await self._redis.delete(*batch)
+                    batch = []
+            if batch:
+                deleted += await self._redis.delete(*batch)
+        except Exception as e:
+            logger.warning(f"⚠️ Error invalidando caché {pattern}: {str(e)}")
+        
+        return deleted
+
+
+def _default_key(prefix: str, params: Dict[str, Any]) -> str:
+    """Clave = prefijo + hash de los parámetros de query ordenados"""
+    normalized = {
+        name: value for name, value in params.items()
+        if value is None or isinstance(value, (str, int, float, bool))
+    }
+    digest = hashlib.sha1(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+    return f"{prefix}:{digest}"
+
+
+# Precisión de coordenadas compartida por la clave de caché y la consulta (~1.1 km)
+COORD_DECIMALS = 2
+
+
+def rounded_coords_key(prefix: str, decimals: int = COORD_DECIMALS) -> Callable[[Dict[str, Any]], str]:
+    """
+    key_builder que redondea latitude/longitude antes de armar la clave:
+    con 2 decimales (~1.1 km) las búsquedas desde puntos cercanos comparten entrada
+    """
+    def key_builder(params: Dict[str, Any]) -> str:
+        params = dict(params)
+        for name in ("latitude", "longitude"):
+            if params.get(name) is not None:
+                params[name] = round(params[name], decimals)
+        return _default_key(prefix, params)
+    
+    return key_builder
+
+
+def cached(prefix: str, expire: int, key_builder: Optional[Callable[[Dict[str, Any]], str]] = None):
+    """
+    Decorador para endpoints GET que devuelven JSON.
+    FastAPI llama a los endpoints con kwargs, así que la clave sale de ellos
+    (Request y demás objetos no serializables se ignoran).
+    El resultado se serializa una sola vez con orjson (dataclasses y datetime incluidos)
+    y se responde con esos bytes, sin pasar por jsonable_encoder; un hit no deserializa nada.
+    """
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = key_builder(kwargs) if key_builder else _default_key(prefix, kwargs)
+            
+            cached_body = await cache_service.get(key)
+            if cached_body is not None:
+                return Response(content=cached_body, media_type="application/json")
+            
+            result = await func(*args, **kwargs)
+            if not isinstance(result, (dict, list)):  # Las respuestas en streaming no se cachean
+                return result
+            
+            body = orjson.dumps(result, default=str, option=orjson.OPT_NON_STR_KEYS)
+            await cache_service.set(key, body, expire)
+            return Response(content=body, media_type="application/json")
+        
+        return wrapper
+    
+    return decorator
+
+
+# Instancia global del servicio
+cache_service = CacheService()
\ No newline at end of file
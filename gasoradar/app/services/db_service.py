@@ -2,21 +2,308 @@
 Servicio de base de datos - OPTIMIZADO para eliminar problema N+1
 """
 import logging
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any
-from statistics import mean
+from math import cos, radians
+from typing import AsyncIterator, List, Optional, Dict, Any, Tuple
 
-from sqlalchemy import select, and_, or_, func, desc, text
-from sqlalchemy.orm import selectinload, joinedload
+from sqlalchemy import select, and_, or_, func, desc, text, cast, Float, distinct, false, true, literal, literal_column, bindparam, union_all, any_
+from sqlalchemy.dialects.postgresql import ARRAY, UUID
+from sqlalchemy.orm import aliased, contains_eager, joinedload, load_only
 
-from ..database import async_session
-from ..models.gas_station import GasStation
+from ..config import get_settings, FUEL_INDEX, FUEL_TYPES
+from ..database import async_session, engine
+from ..models.gas_station import GasStation, Geography, current_prices_from
 from ..models.gas_price import GasPrice
 from ..models.user_report import UserPriceReport
 from ..models.review import GasStationReview
 
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+def _bounding_box(latitude: float, longitude: float, radius_km: float) -> Tuple[float, ...]:
+    """(lat_min, lat_max, lng_min, lng_max, cos(latitud)) calculados en Python"""
+    # Bounding box: 1° de latitud ≈ 111 km; la longitud se escala con cos(lat)
+    cos_lat = cos(radians(latitude))
+    lat_delta = radius_km / 111.0
+    lng_delta = radius_km / (111.0 * max(cos_lat, 0.01))
+    return (
+        latitude - lat_delta, latitude + lat_delta,
+        longitude - lng_delta, longitude + lng_delta,
+        cos_lat
+    )
+
+
+def _user_point(latitude: float, longitude: float):
+    """Punto del usuario como geography(Point, 4326)"""
+    return cast(
+        func.ST_SetSRID(func.ST_MakePoint(longitude, latitude), 4326),
+        Geography()
+    )
+
+
+def _postgis_radius(latitude: float, longitude: float, radius_m: float):
+    """
+    Filtro ST_DWithin (índice espacial) y distancia en km con PostGIS.
+    use_spheroid=false: distancia sobre la esfera, más barata y con error < 0.5% a estas escalas.
+    """
+    user_point = _user_point(latitude, longitude)
+    distance_km = func.ST_Distance(GasStation.geog, user_point, false(), type_=Float) / 1000.0
+    return [func.ST_DWithin(GasStation.geog, user_point, radius_m, false())], distance_km
+
+
+def _bbox_radius(latitude: float, longitude: float, radius_km: float,
+                 lat_min: float, lat_max: float, lng_min: float, lng_max: float, cos_lat: float):
+    """Bounding box (índice latitude/longitude) + Haversine exacta sobre los candidatos"""
+    distance_km = 2 * 6371.0 * func.asin(func.sqrt(
+        func.power(func.sin(func.radians(GasStation.latitude - latitude, type_=Float) / 2.0), 2) +
+        func.cos(func.radians(GasStation.latitude)) * cos_lat *
+        func.power(func.sin(func.radians(GasStation.longitude - longitude, type_=Float) / 2.0), 2)
+    ), type_=Float)
+    
+    conditions = [
+        GasStation.latitude.between(lat_min, lat_max),
+        GasStation.longitude.between(lng_min, lng_max),
+        distance_km <= radius_km
+    ]
+    return conditions, distance_km
+
+
+def _radius_filter(latitude: float, longitude: float, radius_km: float):
+    """
+    Construye el filtro de radio en SQL y la expresión de distancia en km.
+    Con PostGIS usa ST_DWithin (índice SP-GiST) y no calcula bounding box; sin PostGIS aplica primero un
+    bounding box (índice latitude/longitude) y luego Haversine sobre los candidatos.
+    """
+    if settings.use_postgis:
+        return _postgis_radius(latitude, longitude, radius_km * 1000.0)
+    return _bbox_radius(latitude, longitude, radius_km, *_bounding_box(latitude, longitude, radius_km))
+
+
+def _distance_order(latitude: float, longitude: float, distance_km):
+    """
+    Expresión para ORDER BY distancia. Con PostGIS usa el operador KNN <->: el índice
+    espacial entrega las filas ya ordenadas y el LIMIT corta sin ordenar todos los candidatos.
+    """
+    if settings.use_postgis:
+        return GasStation.geog.op("<->", return_type=Float)(_user_point(latitude, longitude))
+    return distance_km
+
+
+def _select_within(query, conditions, distance_km):
+    """Agrega la columna distance_km y el filtro de radio a un select"""
+    return query.add_columns(distance_km.label("distance_km")).where(*conditions)
+
+
+def _stations_with_prices_query(station_ids: List[str] = None,
+                                fuel_type: Optional[str] = None,
+                                latitude: Optional[float] = None,
+                                longitude: Optional[float] = None,
+                                radius_km: Optional[int] = None,
+                                city: Optional[str] = None,
+                                state: Optional[str] = None,
+                                brand: Optional[str] = None,
+                                limit: int = 100,
+                                offset: int = 0):
+    """
+    Query de gasolineras con sus precios actuales (una fila por gasolinera).
+    Los precios vienen de las columnas desnormalizadas current_<combustible>_*,
+    así que no hace falta JOIN con gas_prices.
+    Retorna (query, stations_query); stations_query es la query filtrada sin paginar.
+    """
+    # Con filtro de combustible solo se traen los precios de ese combustible
+    if fuel_type:
+        fuel_type = fuel_type.lower()
+        fuels = [fuel_type] if fuel_type in FUEL_INDEX else []
+    else:
+        fuels = FUEL_TYPES
+    
+    # Filtros, orden y paginación en SQL
+    station_columns = [
+        GasStation.id,
+        GasStation.name,
+        GasStation.brand,
+        GasStation.address,
+        GasStation.city,
+        GasStation.state,
+        GasStation.latitude,
+        GasStation.longitude,
+        GasStation.has_magna,
+        GasStation.has_premium,
+        GasStation.has_diesel,
+        *GasStation.current_price_columns(fuels)
+    ]
+    
+    conditions = [GasStation.is_active == True]
+    order_by = [GasStation.name]
+    
+    # Filtro de radio (PostGIS o bounding box, ver _radius_filter)
+    if latitude and longitude and radius_km:
+        radius_conditions, distance_km = _radius_filter(latitude, longitude, radius_km)
+        station_columns.append(distance_km.label("distance_km"))
+        conditions.extend(radius_conditions)
+        order_by = [_distance_order(latitude, longitude, distance_km), GasStation.name]
+    
+    stations_query = select(
+        *station_columns,
+        func.count().over().label("total")  # Total antes de LIMIT/OFFSET
+    ).where(*conditions)
+    
+    # Filtros
+    if station_ids:
+        # Un solo parámetro uuid[]: el SQL no cambia con la cantidad de ids (IN expande uno por id)
+        ids = bindparam("station_ids", list(station_ids), type_=ARRAY(UUID(as_uuid=False)))
+        stations_query = stations_query.where(GasStation.id == any_(ids))
+    if city:
+        stations_query = stations_query.where(GasStation.city.ilike(f"%{city}%"))
+    if state:
+        stations_query = stations_query.where(GasStation.state.ilike(f"%{state}%"))
+    if brand:
+        stations_query = stations_query.where(GasStation.brand.ilike(f"%{brand}%"))
+    
+    # Filtro por tipo de combustible
+    if fuel_type == "magna":
+        stations_query = stations_query.where(GasStation.has_magna == True)
+    elif fuel_type == "premium":
+        stations_query = stations_query.where(GasStation.has_premium == True)
+    elif fuel_type == "diesel":
+        stations_query = stations_query.where(GasStation.has_diesel == True)
+    
+    query = stations_query.order_by(*order_by).offset(offset).limit(limit)
+    
+    return query, stations_query
+
+
+@dataclass
+class StationServices:
+    """Combustibles que vende la gasolinera"""
+    __slots__ = ("magna", "premium", "diesel")
+    magna: bool
+    premium: bool
+    diesel: bool
+
+
+@dataclass
+class StationOut:
+    """
+    Gasolinera del listado. Con __slots__ no hay un dict por instancia y orjson
+    serializa el dataclass directamente (distance_km es null sin búsqueda por radio)
+    """
+    __slots__ = (
+        "id", "name", "brand", "address", "city", "state", "latitude", "longitude",
+        "services", "current_prices", "distance_km"
+    )
+    id: str
+    name: str
+    brand: Optional[str]
+    address: Optional[str]
+    city: Optional[str]
+    state: Optional[str]
+    latitude: float
+    longitude: float
+    services: StationServices
+    current_prices: Dict[str, Dict]
+    distance_km: Optional[float]
+
+
+def _station_from_row(row, now: datetime) -> StationOut:
+    """Gasolinera del listado a partir de una fila de _stations_with_prices_query"""
+    return StationOut(
+        id=row.id,
+        name=row.name,
+        brand=row.brand,
+        address=row.address,
+        city=row.city,
+        state=row.state,
+        latitude=row.latitude,
+        longitude=row.longitude,
+        services=StationServices(
+            magna=row.has_magna,
+            premium=row.has_premium,
+            diesel=row.has_diesel
+        ),
+        current_prices=current_prices_from(row, now),
+        distance_km=round(row.distance_km, 2) if "distance_km" in row._fields else None
+    )
+
+
+# Queries de forma fija: se construyen una vez al importar y los valores van como
+# bindparam, así el SQL compilado (y el prepared statement de asyncpg) se reutiliza.
+
+_recent_reviews = aliased(
+    GasStationReview,
+    select(GasStationReview).where(
+        and_(
+            GasStationReview.gas_station_id == GasStation.id,
+            GasStationReview.status == "approved"
+        )
+    ).order_by(desc(GasStationReview.created_at)).limit(5).lateral("recent_reviews")
+)
+
+# Gasolinera + sus 5 reseñas aprobadas más recientes (LEFT JOIN LATERAL)
+_STATION_DETAIL_QUERY = select(GasStation).outerjoin(_recent_reviews, true()).where(
+    and_(
+        GasStation.id == bindparam("station_id"),
+        GasStation.is_active == True
+    )
+).options(
+    contains_eager(GasStation.reviews.of_type(_recent_reviews))
+).order_by(desc(_recent_reviews.created_at))
+
+# Solo lo que necesita un reporte de precio: nombre y combustibles que vende (sin reseñas)
+_STATION_FUELS_QUERY = select(GasStation).where(
+    and_(
+        GasStation.id == bindparam("station_id"),
+        GasStation.is_active == True
+    )
+).options(
+    load_only(GasStation.name, GasStation.has_magna, GasStation.has_premium, GasStation.has_diesel)
+)
+
+# Precio vigente más reciente de cada combustible de una gasolinera (DISTINCT ON:
+# Postgres se queda con la primera fila de cada fuel_type, ya ordenadas por el índice de 006)
+_STATION_PRICES_QUERY = select(GasPrice).distinct(GasPrice.fuel_type).where(
+    and_(
+        GasPrice.gas_station_id == bindparam("station_id"),
+        GasPrice.is_current == True,
+        GasPrice.validation_status == "validated"
+    )
+).order_by(GasPrice.fuel_type, desc(GasPrice.created_at))
+
+_OVERVIEW_QUERY = select(
+    func.count().label("total_stations"),
+    func.count(distinct(GasStation.state)).label("states"),
+    func.count(distinct(GasStation.city)).label("cities"),
+    select(func.count()).select_from(GasPrice).scalar_subquery().label("total_prices"),
+    func.max(GasStation.updated_at).label("last_updated")
+).where(GasStation.is_active == True)
+
+
+def _current_fuel_prices_select(fuel: str):
+    """Precio vigente de un combustible por gasolinera activa, con las columnas de /prices/current"""
+    price = getattr(GasStation, f"current_{fuel}_price")
+    return select(
+        price.label("price"),
+        literal(fuel).label("fuel_type"),
+        getattr(GasStation, f"current_{fuel}_source").label("source"),
+        getattr(GasStation, f"current_{fuel}_confidence").label("confidence_score"),
+        getattr(GasStation, f"current_{fuel}_updated_at").label("created_at"),
+        GasStation.id.label("station_id"),
+        GasStation.name.label("station_name"),
+        GasStation.address,
+        GasStation.brand,
+        GasStation.latitude,
+        GasStation.longitude,
+        GasStation.city,
+        GasStation.state
+    ).where(
+        and_(
+            GasStation.is_active == True,
+            price.isnot(None)
+        )
+    )
 
 
 class DatabaseService:
@@ -34,49 +321,25 @@ class DatabaseService:
                               offset: int = 0) -> List[GasStation]:
         """
         Obtiene gasolineras con filtros opcionales - OPTIMIZADO
-        Usa una sola query con JOINs para cargar precios actuales
+        Una sola query: los precios actuales ya vienen en las columnas current_<combustible>_*
+        (station.get_current_prices()), sin cargar la relación prices
+        Con coordenadas, cada gasolinera trae distance_km calculada en SQL
         """
         async with async_session() as session:
             logger.info(f"🔍 get_gas_stations llamado con lat={latitude}, lng={longitude}, limit={limit}")
             start_time = datetime.utcnow()
             
-            # QUERY OPTIMIZADA: Cargar gasolineras con precios en una sola consulta
+            # QUERY OPTIMIZADA: gasolineras con sus precios desnormalizados en una sola consulta
             query = select(GasStation).where(GasStation.is_active == True)
             
-            # Usar selectinload para cargar precios actuales eagerly
-            query = query.options(
-                selectinload(GasStation.prices).where(
-                    and_(
-                        GasPrice.is_current == True,
-                        GasPrice.validation_status == "validated"
-                    )
-                )
-            )
-            
-            # Filtros de ubicación - MEJORADOS
-            if latitude and longitude and radius_km:
-                # Usar la fórmula de Haversine simplificada directamente en SQL
-                # Esto es más eficiente que calcular en Python
-                lat_rad = func.radians(latitude)
-                station_lat_rad = func.radians(GasStation.latitude)
-                station_lng_rad = func.radians(GasStation.longitude)
-                lng_rad = func.radians(longitude)
+            # Filtros de ubicación - distancia calculada por PostGIS (o Haversine en SQL)
+            with_distance = bool(latitude and longitude and radius_km)
+            if with_distance:
+                radius_conditions, distance_km = _radius_filter(latitude, longitude, radius_km)
+                query = _select_within(query, radius_conditions, distance_km)
                 
-                # Fórmula de Haversine en SQL
-                distance_km = (
-                    6371 * func.acos(
-                        func.cos(lat_rad) * 
-                        func.cos(station_lat_rad) * 
-                        func.cos(station_lng_rad - lng_rad) + 
-                        func.sin(lat_rad) * 
-                        func.sin(station_lat_rad)
-                    )
-                )
-                
-                query = query.where(distance_km <= radius_km)
-                
-                # Ordenar por distancia
-                query = query.order_by(distance_km)
+                # Ordenar por distancia (KNN con PostGIS)
+                query = query.order_by(_distance_order(latitude, longitude, literal_column("distance_km")))
             else:
                 # Sin coordenadas, ordenar por nombre
                 query = query.order_by(GasStation.name)
@@ -104,7 +367,13 @@ class DatabaseService:
             
             # Ejecutar query
             result = await session.execute(query)
-            stations = result.scalars().unique().all()  # unique() para evitar duplicados del join
+            if with_distance:
+                stations = []
+                for station, distance in result.all():
+                    station.distance_km = round(distance, 2)  # Atributo no mapeado, solo para la respuesta
+                    stations.append(station)
+            else:
+                stations = result.scalars().all()
             
             elapsed = (datetime.utcnow() - start_time).total_seconds()
             logger.info(f"✅ get_gas_stations completado en {elapsed:.3f}s - {len(stations)} estaciones")
@@ -114,156 +383,147 @@ class DatabaseService:
     async def get_gas_stations_with_prices_bulk(self, 
                                                station_ids: List[str] = None,
                                                fuel_type: Optional[str] = None,
-                                               limit: int = 100) -> List[Dict]:
+                                               latitude: Optional[float] = None,
+                                               longitude: Optional[float] = None,
+                                               radius_km: Optional[int] = None,
+                                               city: Optional[str] = None,
+                                               state: Optional[str] = None,
+                                               brand: Optional[str] = None,
+                                               limit: int = 100,
+                                               offset: int = 0) -> Tuple[List[StationOut], int]:
         """
-        Versión optimizada que usa una sola query con JOIN para obtener 
-        gasolineras y precios juntos - MUY RÁPIDO
+        Versión optimizada que obtiene gasolineras y precios actuales
+        en una sola query, sin JOIN - MUY RÁPIDO
+        Filtros, radio y paginación se resuelven en SQL
+        Retorna (gasolineras de la página, total de gasolineras que cumplen los filtros)
         """
         async with async_session() as session:
             start_time = datetime.utcnow()
             
-            # Query con JOIN para obtener todo de una vez
-            query = select(
-                GasStation.id,
-                GasStation.name,
-                GasStation.brand,
-                GasStation.address,
-                GasStation.city,
-                GasStation.state,
-                GasStation.latitude,
-                GasStation.longitude,
-                GasStation.has_magna,
-                GasStation.has_premium,
-                GasStation.has_diesel,
-                GasPrice.fuel_type,
-                GasPrice.price,
-                GasPrice.source,
-                GasPrice.confidence_score,
-                GasPrice.created_at
-            ).select_from(
-                GasStation.__table__.join(
-                    GasPrice.__table__,
-                    and_(
-                        GasStation.id == GasPrice.gas_station_id,
-                        GasPrice.is_current == True,
-                        GasPrice.validation_status == "validated"
-                    ),
-                    isouter=True  # LEFT JOIN para incluir gasolineras sin precios
-                )
-            ).where(GasStation.is_active == True)
-            
-            # Filtros
-            if station_ids:
-                query = query.where(GasStation.id.in_(station_ids))
-            
-            if fuel_type:
-                query = query.where(
-                    or_(
-                        GasPrice.fuel_type == fuel_type.lower(),
-                        GasPrice.fuel_type.is_(None)  # Incluir gasolineras sin precios
-                    )
-                )
-            
-            query = query.order_by(GasStation.name, GasPrice.fuel_type).limit(limit * 3)  # Multiplicar por 3 tipos de combustible
+            query, stations_query = _stations_with_prices_query(
+                station_ids, fuel_type, latitude, longitude, radius_km,
+                city, state, brand, limit, offset
+            )
             
             result = await session.execute(query)
             rows = result.all()
             
-            # Procesar resultados - agrupar por gasolinera
-            stations_dict = {}
-            for row in rows:
-                station_id = row.id
-                
-                if station_id not in stations_dict:
-                    stations_dict[station_id] = {
-                        "id": row.id,
-                        "name": row.name,
-                        "brand": row.brand,
-                        "address": row.address,
-                        "city": row.city,
-                        "state": row.state,
-                        "latitude": row.latitude,
-                        "longitude": row.longitude,
-                        "services": {
-                            "magna": row.has_magna,
-                            "premium": row.has_premium,
-                            "diesel": row.has_diesel,
-                        },
-                        "current_prices": {}
-                    }
-                
-                # Agregar precio si existe
-                if row.fuel_type and row.price:
-                    stations_dict[station_id]["current_prices"][row.fuel_type] = {
-                        "price": row.price,
-                        "source": row.source,
-                        "confidence": row.confidence_score,
-                        "updated_at": row.created_at.isoformat(),
-                        "age_hours": (datetime.utcnow() - row.created_at).total_seconds() / 3600,
-                        "is_fresh": (datetime.utcnow() - row.created_at).total_seconds() / 3600 <= 24
-                    }
+            if rows:
+                total = rows[0].total
+            elif offset > 0:
+                # Página fuera de rango: el total no viene en ninguna fila
+                total = await session.scalar(
+                    select(func.count()).select_from(stations_query.subquery())
+                )
+            else:
+                total = 0
             
-            stations_list = list(stations_dict.values())[:limit]  # Aplicar límite final
+            # Una fila por gasolinera, con sus precios actuales
+            now = datetime.utcnow()
+            stations_list = [_station_from_row(row, now) for row in rows]
             
             elapsed = (datetime.utcnow() - start_time).total_seconds()
-            logger.info(f"🚀 get_gas_stations_with_prices_bulk completado en {elapsed:.3f}s - {len(stations_list)} estaciones")
+            logger.info(f"🚀 get_gas_stations_with_prices_bulk completado en {elapsed:.3f}s - {len(stations_list)} de {total} estaciones")
             
-            return stations_list
+            return stations_list, total
+    
+    async def stream_gas_stations_with_prices(self,
+                                             fuel_type: Optional[str] = None,
+                                             latitude: Optional[float] = None,
+                                             longitude: Optional[float] = None,
+                                             radius_km: Optional[int] = None,
+                                             city: Optional[str] = None,
+                                             state: Optional[str] = None,
+                                             brand: Optional[str] = None,
+                                             limit: int = 100,
+                                             offset: int = 0) -> AsyncIterator[Tuple[StationOut, int]]:
+        """
+        Igual que get_gas_stations_with_prices_bulk pero entrega cada gasolinera
+        en cuanto llega su fila (cursor del servidor, sin cargar la lista completa).
+        Genera tuplas (gasolinera, total); si la página queda fuera de rango
+        genera una única tupla (None, total).
+        """
+        query, stations_query = _stations_with_prices_query(
+            None, fuel_type, latitude, longitude, radius_km,
+            city, state, brand, limit, offset
+        )
+        
+        async with engine.connect() as conn:
+            result = await conn.stream(query)
+            now = datetime.utcnow()
+            
+            empty = True
+            async for row in result:
+                empty = False
+                yield _station_from_row(row, now), row.total
+            
+            if empty and offset > 0:
+                # Página fuera de rango: el total no viene en ninguna fila
+                total = await conn.scalar(
+                    select(func.count()).select_from(stations_query.subquery())
+                )
+                yield None, total
     
     async def get_current_prices_all_stations_optimized(self, 
                                                       fuel_type: Optional[str] = None,
                                                       city: Optional[str] = None,
                                                       state: Optional[str] = None,
+                                                      latitude: Optional[float] = None,
+                                                      longitude: Optional[float] = None,
+                                                      radius_km: Optional[int] = None,
+                                                      sort_by: str = "price",
                                                       limit: int = 100) -> List[Dict]:
         """
         Versión super optimizada para obtener precios actuales de múltiples gasolineras
+        Lee los precios desnormalizados de gas_stations; orden (price, updated, distance) y límite en SQL
         """
         async with async_session() as session:
             start_time = datetime.utcnow()
             
-            # Una sola query con JOIN optimizado
-            query = select(
-                GasPrice.price,
-                GasPrice.fuel_type,
-                GasPrice.source,
-                GasPrice.confidence_score,
-                GasPrice.created_at,
-                GasStation.id.label('station_id'),
-                GasStation.name.label('station_name'),
-                GasStation.address,
-                GasStation.brand,
-                GasStation.latitude,
-                GasStation.longitude,
-                GasStation.city,
-                GasStation.state
-            ).select_from(
-                GasPrice.__table__.join(GasStation.__table__)
-            ).where(
-                and_(
-                    GasPrice.is_current == True,
-                    GasPrice.validation_status == "validated",
-                    GasStation.is_active == True
-                )
-            )
-            
-            if fuel_type:
-                query = query.where(GasPrice.fuel_type == fuel_type.lower())
+            # Precios vigentes desde las columnas current_<combustible>_* de gas_stations
+            # (las mantiene el trigger de migrations/005): sin JOIN contra gas_prices
+            fuels = [fuel for fuel in FUEL_TYPES if not fuel_type or fuel == fuel_type.lower()]
+            if not fuels:
+                return []
             
+            conditions = []
             if city:
-                query = query.where(GasStation.city.ilike(f"%{city}%"))
-            
+                conditions.append(GasStation.city.ilike(f"%{city}%"))
             if state:
-                query = query.where(GasStation.state.ilike(f"%{state}%"))
-            
-            query = query.order_by(GasPrice.price.asc()).limit(limit)
+                conditions.append(GasStation.state.ilike(f"%{state}%"))
+            
+            # Filtro de radio en SQL (PostGIS o bounding box)
+            with_distance = bool(latitude and longitude and radius_km)
+            if with_distance:
+                radius_conditions, distance_km = _radius_filter(latitude, longitude, radius_km)
+            
+            # Un select por combustible; sin filtro de combustible se unen los tres
+            branches = []
+            for fuel in fuels:
+                branch = _current_fuel_prices_select(fuel).where(*conditions)
+                if with_distance:
+                    branch = _select_within(branch, radius_conditions, distance_km)
+                branches.append(branch)
+            query = branches[0] if len(branches) == 1 else union_all(*branches)
+            
+            # Ordenamiento (por nombre de columna de salida, válido también para el UNION)
+            if sort_by == "updated":
+                query = query.order_by(literal_column("created_at").desc())
+            elif sort_by == "distance" and with_distance:
+                query = query.order_by(literal_column("distance_km").asc())
+            else:  # price
+                query = query.order_by(literal_column("price").asc())
+            
+            query = query.limit(limit)
             
             result = await session.execute(query)
             rows = result.all()
             
+            now = datetime.utcnow()
             prices_data = []
             for row in rows:
-                age_hours = (datetime.utcnow() - row.created_at).total_seconds() / 3600
-                prices_data.append({
+                age_hours = (now - row.created_at).total_seconds() / 3600
+                price_data = {
                     "gas_station_id": row.station_id,
                     "gas_station_name": row.station_name,
                     "gas_station_address": row.address,
@@ -280,7 +540,12 @@ class DatabaseService:
                         "city": row.city,
                         "state": row.state
                     }
-                })
+                }
+                
+                if "distance_km" in row._fields:
+                    price_data["distance_km"] = round(row.distance_km, 2)
+                
+                prices_data.append(price_data)
             
             elapsed = (datetime.utcnow() - start_time).total_seconds()
             logger.info(f"🚀 get_current_prices_all_stations_optimized completado en {elapsed:.3f}s - {len(prices_data)} precios")
@@ -288,19 +553,22 @@ class DatabaseService:
             return prices_data
     
     async def get_gas_station_by_id(self, station_id: str) -> Optional[GasStation]:
-        """Obtiene una gasolinera por ID con precios y reseñas - OPTIMIZADO"""
+        """
+        Obtiene una gasolinera por ID con las 5 reseñas más recientes - OPTIMIZADO
+        Una sola query: las reseñas llegan por un LEFT JOIN LATERAL (top 5 aprobadas por fecha)
+        Los precios actuales vienen en las columnas current_<combustible>_* (get_current_prices())
+        """
         async with async_session() as session:
-            query = select(GasStation).where(
-                and_(
-                    GasStation.id == station_id,
-                    GasStation.is_active == True
-                )
-            ).options(
-                selectinload(GasStation.prices).where(GasPrice.is_current == True),
-                selectinload(GasStation.reviews).where(GasStationReview.status == "approved")
-            )
-            
-            result = await session.execute(query)
+            result = await session.execute(_STATION_DETAIL_QUERY, {"station_id": station_id})
+            return result.unique().scalar_one_or_none()
+    
+    async def get_gas_station_fuels(self, station_id: str) -> Optional[GasStation]:
+        """
+        Obtiene una gasolinera activa con solo nombre y combustibles (has_fuel_type()),
+        sin el LATERAL de reseñas de get_gas_station_by_id
+        """
+        async with async_session() as session:
+            result = await session.execute(_STATION_FUELS_QUERY, {"station_id": station_id})
             return result.scalar_one_or_none()
     
     async def get_current_prices(self, station_id: str) -> Dict[str, Optional[Dict]]:
@@ -309,31 +577,22 @@ class DatabaseService:
         Nota: Esta función solo se usa cuando necesitamos precios de una sola gasolinera
         """
         async with async_session() as session:
-            query = select(GasPrice).where(
-                and_(
-                    GasPrice.gas_station_id == station_id,
-                    GasPrice.is_current == True,
-                    GasPrice.validation_status == "validated"
-                )
-            ).order_by(desc(GasPrice.created_at))
-            
-            result = await session.execute(query)
+            result = await session.execute(_STATION_PRICES_QUERY, {"station_id": station_id})
             prices = result.scalars().all()
             
-            # Organizar por tipo de combustible
-            current_prices = {}
-            for price in prices:
-                if price.fuel_type not in current_prices:
-                    current_prices[price.fuel_type] = {
-                        "price": price.price,
-                        "source": price.source,
-                        "confidence": price.confidence_score,
-                        "updated_at": price.created_at.isoformat(),
-                        "age_hours": price.calculate_age_hours(),
-                        "is_fresh": price.is_fresh()
-                    }
-            
-            return current_prices
+            # Una fila por tipo de combustible
+            now = datetime.utcnow()
+            return {
+                price.fuel_type: {
+                    "price": price.price,
+                    "source": price.source,
+                    "confidence": price.confidence_score,
+                    "updated_at": price.created_at.isoformat(),
+                    "age_hours": price.calculate_age_hours(now),
+                    "is_fresh": price.is_fresh(now)
+                }
+                for price in prices
+            }
     
     # Resto de métodos sin cambios (create_price_report, create_review, etc.)
     async def create_price_report(self, report_data: dict, request_ip: str) -> UserPriceReport:
@@ -431,12 +690,18 @@ class DatabaseService:
             return result.scalars().all()
     
     async def get_price_statistics(self, fuel_type: str, region: Optional[str] = None) -> Dict:
-        """Obtiene estadísticas de precios"""
+        """Obtiene estadísticas de precios - agregados calculados en SQL (una sola fila)"""
         async with async_session() as session:
-            # Obtener precios recientes
+            # Precios recientes
             cutoff_date = datetime.utcnow() - timedelta(days=7)
             
-            query = select(GasPrice.price).where(
+            query = select(
+                func.count().label("sample_size"),
+                func.avg(GasPrice.price).label("average"),
+                func.min(GasPrice.price).label("minimum"),
+                func.max(GasPrice.price).label("maximum"),
+                func.percentile_cont(0.5).within_group(GasPrice.price).label("median")
+            ).where(
                 and_(
                     GasPrice.fuel_type == fuel_type.lower(),
                     GasPrice.created_at >= cutoff_date,
@@ -455,27 +720,43 @@ class DatabaseService:
                 )
             
             result = await session.execute(query)
-            prices = [row[0] for row in result.fetchall()]
+            stats = result.one()
             
-            if not prices:
+            if not stats.sample_size:
                 return {"error": "No hay datos de precios disponibles"}
             
             return {
                 "fuel_type": fuel_type,
                 "region": region or "nacional",
-                "sample_size": len(prices),
-                "average": round(mean(prices), 2),
-                "minimum": min(prices),
-                "maximum": max(prices),
-                "range": round(max(prices) - min(prices), 2)
+                "sample_size": stats.sample_size,
+                "average": round(stats.average, 2),
+                "median": round(stats.median, 2),
+                "minimum": stats.minimum,
+                "maximum": stats.maximum,
+                "range": round(stats.maximum - stats.minimum, 2)
+            }
+    
+    async def compute_overview(self) -> Dict:
+        """Estadísticas generales en una sola query de agregados (se cachea en el endpoint)"""
+        async with async_session() as session:
+            result = await session.execute(_OVERVIEW_QUERY)
+            row = result.one()
+            
+            return {
+                "total_stations": row.total_stations,
+                "total_prices": row.total_prices,
+                "states": row.states,
+                "cities": row.cities,
+                "last_updated": row.last_updated.isoformat() if row.last_updated else None
             }
     
     async def search_stations_by_region(self, region: str, fuel_type: str, limit: int = 20) -> List[Dict]:
         """Busca estaciones más baratas por región - OPTIMIZADO"""
         async with async_session() as session:
             # Una sola query con JOIN optimizado
+            # Las columnas ya llevan el nombre del campo de la respuesta
             query = select(
-                GasStation.id,
+                GasStation.id.label("gas_station_id"),
                 GasStation.name,
                 GasStation.brand,
                 GasStation.address,
@@ -483,8 +764,8 @@ class DatabaseService:
                 GasStation.longitude,
                 GasPrice.price,
                 GasPrice.source,
-                GasPrice.confidence_score,
-                GasPrice.created_at
+                GasPrice.confidence_score.label("confidence"),
+                GasPrice.created_at.label("updated_at")
             ).select_from(
                 GasStation.__table__.join(GasPrice.__table__)
             ).where(
@@ -501,26 +782,17 @@ class DatabaseService:
             ).order_by(GasPrice.price.asc()).limit(limit)
             
             result = await session.execute(query)
-            rows = result.all()
-            
-            stations_with_prices = []
-            for row in rows:
-                age_hours = (datetime.utcnow() - row.created_at).total_seconds() / 3600
-                stations_with_prices.append({
-                    "gas_station_id": row.id,
-                    "name": row.name,
-                    "brand": row.brand,
-                    "address": row.address,
-                    "latitude": row.latitude,
-                    "longitude": row.longitude,
-                    "price": row.price,
-                    "source": row.source,
-                    "confidence": row.confidence_score,
-                    "updated_at": row.created_at.isoformat(),
-                    "age_hours": age_hours
-                })
             
-            return stations_with_prices
+            # Cada fila como mapping: solo se convierten la fecha y la edad
+            now = datetime.utcnow()
+            return [
+                {
+                    **row,
+                    "updated_at": row["updated_at"].isoformat(),
+                    "age_hours": (now - row["updated_at"]).total_seconds() / 3600
+                }
+                for row in result.mappings()
+            ]
 
 
 # Instancia global del servicio
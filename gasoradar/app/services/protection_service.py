@@ -3,20 +3,21 @@ Servicio de protección: CAPTCHA + Rate limiting + Validación dinámica de prec
 """
 import asyncio
 import logging
+import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from collections import defaultdict, deque
-from statistics import mean
 
 import aiohttp
 from sqlalchemy import select, and_, func
 from sqlalchemy.orm import Session
 
-from ..config import settings
-from ..database import get_async_session
+from ..config import get_settings, FUEL_INDEX, FALLBACK_MIN, FALLBACK_MAX
+from ..database import async_session
 
 
 logger = logging.getLogger(__name__)
+settings = get_settings()
 
 
 class ProtectionService:
@@ -35,7 +36,11 @@ class ProtectionService:
         self.price_tolerance = settings.price_tolerance_percent / 100.0  # Convertir a decimal
         self.min_samples = settings.min_samples_for_validation
         self.freshness_days = settings.price_data_freshness_days
-        self.fallback_ranges = settings.fallback_price_ranges
+        
+        # Caché en memoria de estadísticas de mercado: (combustible, región) -> (expira, promedio, muestras)
+        self._market_stats: Dict[Tuple[str, Optional[str]], Tuple[float, Optional[float], int]] = {}
+        self.market_stats_ttl = 300  # Segundos
+        self.market_stats_max_entries = 1000
     
     async def verify_recaptcha(self, token: str, user_ip: str = None) -> Tuple[bool, str]:
         """
@@ -124,68 +129,86 @@ class ProtectionService:
         self._reviews[ip].append(now)
         return True, "Rate limit OK"
     
+    async def _get_market_stats(self, fuel_type: str, region: str = None) -> Tuple[Optional[float], int]:
+        """
+        Promedio y número de muestras de precios recientes (agregados en SQL).
+        Se guardan en memoria unos minutos para no recalcularlos en cada reporte.
+        """
+        key = (fuel_type.lower(), region.lower() if region else None)
+        now = time.monotonic()
+        
+        cached = self._market_stats.get(key)
+        if cached and cached[0] > now:
+            return cached[1], cached[2]
+        
+        from ..models.gas_price import GasPrice
+        from ..models.gas_station import GasStation
+        
+        cutoff_date = datetime.utcnow() - timedelta(days=self.freshness_days)
+        
+        query = select(func.avg(GasPrice.price), func.count(GasPrice.price)).where(
+            and_(
+                GasPrice.fuel_type == fuel_type.lower(),
+                GasPrice.created_at >= cutoff_date,
+                GasPrice.is_current == True,
+                GasPrice.validation_status == "validated"
+            )
+        )
+        
+        # Filtrar por región si se especifica
+        if region:
+            query = query.join(GasStation).where(
+                GasStation.state.ilike(f"%{region}%")
+            )
+        
+        async with async_session() as session:
+            result = await session.execute(query)
+            market_avg, samples = result.one()
+        
+        # Límite simple de tamaño: las claves son (combustible, región)
+        if len(self._market_stats) >= self.market_stats_max_entries:
+            self._market_stats.clear()
+        self._market_stats[key] = (now + self.market_stats_ttl, market_avg, samples)
+        
+        return market_avg, samples
+    
     async def validate_price_dynamically(self, fuel_type: str, reported_price: float, 
                                        region: str = None) -> Tuple[bool, str, Dict]:
         """
         Valida precio contra promedios actuales del mercado (±15%)
         """
         try:
-            async with get_async_session() as session:
-                # Obtener precios recientes del combustible
-                cutoff_date = datetime.utcnow() - timedelta(days=self.freshness_days)
-                
-                # Query para obtener precios recientes y válidos
-                from ..models.gas_price import GasPrice
-                from ..models.gas_station import GasStation
-                
-                query = select(GasPrice.price).where(
-                    and_(
-                        GasPrice.fuel_type == fuel_type.lower(),
-                        GasPrice.created_at >= cutoff_date,
-                        GasPrice.is_current == True,
-                        GasPrice.validation_status == "validated"
-                    )
-                )
-                
-                # Filtrar por región si se especifica
-                if region:
-                    query = query.join(GasStation).where(
-                        GasStation.state.ilike(f"%{region}%")
-                    )
+            market_avg, samples = await self._get_market_stats(fuel_type, region)
+            
+            # Verificar si tenemos suficientes datos
+            if samples < self.min_samples:
+                return self._validate_with_fallback(fuel_type, reported_price)
+            
+            # Calcular rango válido
+            tolerance = self.price_tolerance
+            min_valid = market_avg * (1 - tolerance)
+            max_valid = market_avg * (1 + tolerance)
+            
+            # Validar precio reportado
+            is_valid = min_valid <= reported_price <= max_valid
+            
+            validation_info = {
+                "market_average": round(market_avg, 2),
+                "tolerance_percent": self.price_tolerance * 100,
+                "valid_range": {
+                    "min": round(min_valid, 2),
+                    "max": round(max_valid, 2)
+                },
+                "samples_count": samples,
+                "reported_price": reported_price
+            }
+            
+            if is_valid:
+                return True, "Precio dentro del rango de mercado", validation_info
+            else:
+                reason = f"Precio fuera del rango válido (${min_valid:.2f} - ${max_valid:.2f})"
+                return False, reason, validation_info
                 
-                result = await session.execute(query)
-                prices = [row[0] for row in result.fetchall()]
-                
-                # Verificar si tenemos suficientes datos
-                if len(prices) < self.min_samples:
-                    return self._validate_with_fallback(fuel_type, reported_price)
-                
-                # Calcular estadísticas del mercado
-                market_avg = mean(prices)
-                tolerance = self.price_tolerance
-                min_valid = market_avg * (1 - tolerance)
-                max_valid = market_avg * (1 + tolerance)
-                
-                # Validar precio reportado
-                is_valid = min_valid <= reported_price <= max_valid
-                
-                validation_info = {
-                    "market_average": round(market_avg, 2),
-                    "tolerance_percent": self.price_tolerance * 100,
-                    "valid_range": {
-                        "min": round(min_valid, 2),
-                        "max": round(max_valid, 2)
-                    },
-                    "samples_count": len(prices),
-                    "reported_price": reported_price
-                }
-                
-                if is_valid:
-                    return True, "Precio dentro del rango de mercado", validation_info
-                else:
-                    reason = f"Precio fuera del rango válido (${min_valid:.2f} - ${max_valid:.2f})"
-                    return False, reason, validation_info
-                    
         except Exception as e:
             logger.error(f"Error validating price dynamically: {str(e)}")
             return self._validate_with_fallback(fuel_type, reported_price)
@@ -194,12 +217,12 @@ class ProtectionService:
         """
         Validación de fallback usando rangos fijos cuando no hay datos suficientes
         """
-        ranges = self.fallback_ranges.get(fuel_type.lower())
-        if not ranges:
+        index = FUEL_INDEX.get(fuel_type.lower())
+        if index is None:
             return True, "No hay límites definidos para este combustible", {}
         
-        min_price = ranges["min"]
-        max_price = ranges["max"]
+        min_price = FALLBACK_MIN[index]
+        max_price = FALLBACK_MAX[index]
         is_valid = min_price <= reported_price <= max_price
         
         validation_info = {
@@ -221,6 +244,18 @@ class ProtectionService:
         2. Rate limiting
         3. Validación dinámica de precio
         """
+        access_ok, access_msg = await self.check_price_report_access(form_data, request_ip)
+        if not access_ok:
+            return False, access_msg
+        
+        return await self.validate_reported_price(form_data)
+    
+    async def check_price_report_access(self, form_data: dict, request_ip: str) -> Tuple[bool, str]:
+        """
+        Protecciones de un reporte de precio que no tocan la base de datos:
+        1. CAPTCHA
+        2. Rate limiting
+        """
         # 1. Verificar CAPTCHA
         captcha_token = form_data.get("g-recaptcha-response")
         captcha_valid, captcha_msg = await self.verify_recaptcha(captcha_token, request_ip)
@@ -232,7 +267,12 @@ class ProtectionService:
         if not rate_limit_ok:
             return False, f"Rate limit: {rate_msg}"
         
-        # 3. Validar precio dinámicamente
+        return True, "Protecciones OK"
+    
+    async def validate_reported_price(self, form_data: dict) -> Tuple[bool, str]:
+        """
+        3. Validación dinámica de precio (consulta el promedio de mercado)
+        """
         fuel_type = form_data.get("fuel_type", "")
         try:
             price = float(form_data.get("reported_price", 0))
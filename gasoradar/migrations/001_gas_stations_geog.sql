@@ -0,0 +1,11 @@
+-- Columna geography + índice GiST para búsquedas por radio en SQL
+-- Ejecutar en el SQL editor de Supabase (requiere PostGIS)
+
+CREATE EXTENSION IF NOT EXISTS postgis;
+
+-- Columna generada: se mantiene sincronizada con latitude/longitude automáticamente
+ALTER TABLE gas_stations
+    ADD COLUMN IF NOT EXISTS geog geography(Point, 4326)
+    GENERATED ALWAYS AS (ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)::geography) STORED;
+
+CREATE INDEX IF NOT EXISTS gas_stations_geog_gix ON gas_stations USING gist (geog);
\ No newline at end of file
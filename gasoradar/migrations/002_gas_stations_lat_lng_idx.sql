@@ -0,0 +1,3 @@
+-- Índice B-tree compuesto para el prefiltro de bounding box (USE_POSTGIS=false)
+
+CREATE INDEX IF NOT EXISTS gas_stations_lat_lng_idx ON gas_stations (latitude, longitude);
\ No newline at end of file
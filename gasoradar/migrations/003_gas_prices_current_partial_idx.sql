@@ -0,0 +1,19 @@
+-- Índices parciales para /prices/current y /prices/cheapest
+-- Ambas consultas filtran por fuel_type + is_current y ordenan por precio o fecha;
+-- al indexar solo los precios actuales el índice es pequeño y evita el sort en memoria.
+-- CONCURRENTLY no puede correr dentro de una transacción: ejecutar cada sentencia por separado.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS gas_prices_current_fuel_price_idx
+    ON gas_prices (fuel_type, price)
+    WHERE is_current = true;
+
+-- sort_by=updated ordena por created_at (es el "updated_at" que expone la API)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS gas_prices_current_fuel_created_idx
+    ON gas_prices (fuel_type, created_at DESC)
+    WHERE is_current = true;
+
+-- Verificar que el planner usa el índice parcial:
+-- EXPLAIN (ANALYZE, BUFFERS)
+-- SELECT price FROM gas_prices
+-- WHERE fuel_type = 'magna' AND is_current = true
+-- ORDER BY price LIMIT 50;
\ No newline at end of file
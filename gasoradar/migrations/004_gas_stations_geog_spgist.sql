@@ -0,0 +1,17 @@
+-- Índice SP-GiST sobre geog: más pequeño y rápido de construir que el GiST de 001,
+-- y soporta ORDER BY geog <-> punto (KNN) para listar por distancia directo del índice.
+-- Requiere PostgreSQL 12+ y PostGIS 3+ (KNN sobre SP-GiST).
+-- CONCURRENTLY no puede correr dentro de una transacción: ejecutar cada sentencia por separado.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS gas_stations_geog_spgist
+    ON gas_stations USING spgist (geog);
+
+-- El GiST de 001 queda redundante
+DROP INDEX CONCURRENTLY IF EXISTS gas_stations_geog_gix;
+
+-- Verificar que el planner recorre el índice en orden de distancia (sin Sort):
+-- EXPLAIN (ANALYZE, BUFFERS)
+-- SELECT id FROM gas_stations
+-- WHERE ST_DWithin(geog, ST_SetSRID(ST_MakePoint(-99.1332, 19.4326), 4326)::geography, 25000)
+-- ORDER BY geog <-> ST_SetSRID(ST_MakePoint(-99.1332, 19.4326), 4326)::geography
+-- LIMIT 50;
\ No newline at end of file
@@ -0,0 +1,84 @@
+-- Precios actuales desnormalizados en gas_stations (uno por combustible)
+-- El listado de gasolineras los lee directo de la fila, sin JOIN con gas_prices.
+-- Un trigger sobre gas_prices los mantiene: ante cualquier cambio recalcula el precio
+-- vigente (is_current + validated, el más reciente) de esa gasolinera y combustible.
+
+ALTER TABLE gas_stations
+    ADD COLUMN IF NOT EXISTS current_magna_price double precision,
+    ADD COLUMN IF NOT EXISTS current_magna_source varchar(20),
+    ADD COLUMN IF NOT EXISTS current_magna_confidence double precision,
+    ADD COLUMN IF NOT EXISTS current_magna_updated_at timestamp,
+    ADD COLUMN IF NOT EXISTS current_premium_price double precision,
+    ADD COLUMN IF NOT EXISTS current_premium_source varchar(20),
+    ADD COLUMN IF NOT EXISTS current_premium_confidence double precision,
+    ADD COLUMN IF NOT EXISTS current_premium_updated_at timestamp,
+    ADD COLUMN IF NOT EXISTS current_diesel_price double precision,
+    ADD COLUMN IF NOT EXISTS current_diesel_source varchar(20),
+    ADD COLUMN IF NOT EXISTS current_diesel_confidence double precision,
+    ADD COLUMN IF NOT EXISTS current_diesel_updated_at timestamp;
+
+CREATE OR REPLACE FUNCTION refresh_station_current_price(p_station_id uuid, p_fuel_type text)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    latest gas_prices%ROWTYPE;
+BEGIN
+    IF p_fuel_type NOT IN ('magna', 'premium', 'diesel') THEN
+        RETURN;
+    END IF;
+
+    SELECT * INTO latest
+    FROM gas_prices
+    WHERE gas_station_id = p_station_id
+      AND fuel_type = p_fuel_type
+      AND is_current = true
+      AND validation_status = 'validated'
+    ORDER BY created_at DESC
+    LIMIT 1;
+
+    -- Sin precio vigente, latest queda en NULL y las columnas se limpian
+    EXECUTE format(
+        'UPDATE gas_stations SET current_%1$s_price = $1, current_%1$s_source = $2, '
+        'current_%1$s_confidence = $3, current_%1$s_updated_at = $4 WHERE id = $5',
+        p_fuel_type
+    ) USING latest.price, latest.source, latest.confidence_score, latest.created_at, p_station_id;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION gas_prices_sync_station_current_price()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        PERFORM refresh_station_current_price(NEW.gas_station_id, NEW.fuel_type);
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM refresh_station_current_price(OLD.gas_station_id, OLD.fuel_type);
+    ELSE
+        PERFORM refresh_station_current_price(NEW.gas_station_id, NEW.fuel_type);
+        IF (OLD.gas_station_id, OLD.fuel_type) IS DISTINCT FROM (NEW.gas_station_id, NEW.fuel_type) THEN
+            PERFORM refresh_station_current_price(OLD.gas_station_id, OLD.fuel_type);
+        END IF;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS gas_prices_sync_station_current_price ON gas_prices;
+CREATE TRIGGER gas_prices_sync_station_current_price
+    AFTER INSERT OR DELETE OR UPDATE OF
+        gas_station_id, fuel_type, price, source, confidence_score,
+        validation_status, is_current, created_at
+    ON gas_prices
+    FOR EACH ROW
+    EXECUTE FUNCTION gas_prices_sync_station_current_price();
+
+-- Backfill con los precios vigentes existentes
+SELECT refresh_station_current_price(gas_station_id, fuel_type)
+FROM (
+    SELECT DISTINCT gas_station_id, fuel_type
+    FROM gas_prices
+    WHERE is_current = true
+      AND validation_status = 'validated'
+) current_prices;
\ No newline at end of file
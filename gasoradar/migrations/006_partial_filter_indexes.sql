@@ -0,0 +1,35 @@
+-- Índices parciales alineados con los WHERE reales: toda consulta de la app sobre
+-- gas_prices filtra is_current = true AND validation_status = 'validated', y las de
+-- gas_stations filtran is_active = true. Con el mismo predicado el planner puede
+-- usar el índice parcial (y con menos filas que los de 003, que solo exigían is_current).
+-- CONCURRENTLY no puede correr dentro de una transacción: ejecutar cada sentencia por separado.
+
+-- /prices/current, /prices/cheapest y search_stations_by_region (ORDER BY price)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS gas_prices_validated_fuel_price_idx
+    ON gas_prices (fuel_type, price)
+    WHERE is_current = true AND validation_status = 'validated';
+
+-- sort_by=updated y get_price_statistics (created_at >= corte de 7 días)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS gas_prices_validated_fuel_created_idx
+    ON gas_prices (fuel_type, created_at DESC)
+    WHERE is_current = true AND validation_status = 'validated';
+
+-- Precio vigente por gasolinera: trigger de 005 y get_current_prices(station_id)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS gas_prices_validated_station_fuel_idx
+    ON gas_prices (gas_station_id, fuel_type, created_at DESC)
+    WHERE is_current = true AND validation_status = 'validated';
+
+-- Filtros por estado/ciudad sobre gasolineras activas
+CREATE INDEX CONCURRENTLY IF NOT EXISTS gas_stations_active_state_city_idx
+    ON gas_stations (state, city)
+    WHERE is_active = true;
+
+-- Los índices de 003 quedan cubiertos por los nuevos
+DROP INDEX CONCURRENTLY IF EXISTS gas_prices_current_fuel_price_idx;
+DROP INDEX CONCURRENTLY IF EXISTS gas_prices_current_fuel_created_idx;
+
+-- Verificar que el planner usa el índice parcial:
+-- EXPLAIN (ANALYZE, BUFFERS)
+-- SELECT price FROM gas_prices
+-- WHERE fuel_type = 'magna' AND is_current = true AND validation_status = 'validated'
+-- ORDER BY price LIMIT 50;
\ No newline at end of file
@@ -0,0 +1,14 @@
+-- Índice BRIN sobre gas_prices.created_at: los precios se insertan en orden de fecha
+-- (las actualizaciones no tocan created_at), así que cada rango de páginas cubre un intervalo de tiempo
+-- compacto. Ocupa unos pocos KB y deja a get_price_statistics (ventana de 7 días) y a los
+-- reportes por fecha leer solo los rangos recientes en vez de toda la tabla.
+-- CONCURRENTLY no puede correr dentro de una transacción: ejecutar la sentencia por separado.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS gas_prices_created_brin
+    ON gas_prices USING brin (created_at)
+    WITH (pages_per_range = 32);
+
+-- Verificar que el planner usa el índice (Bitmap Index Scan on gas_prices_created_brin):
+-- EXPLAIN (ANALYZE, BUFFERS)
+-- SELECT count(*), avg(price) FROM gas_prices
+-- WHERE created_at >= now() - interval '7 days';
\ No newline at end of file
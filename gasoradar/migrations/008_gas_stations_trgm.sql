@@ -0,0 +1,24 @@
+-- Índices trigram para los filtros ILIKE '%texto%' sobre ciudad, estado y marca.
+-- Un btree no sirve para un patrón con % al inicio; con pg_trgm el planner usa el GIN
+-- (Bitmap Index Scan) en lugar de recorrer toda la tabla de gasolineras.
+-- Parciales sobre activas: todas las búsquedas de la app filtran is_active = true.
+-- CONCURRENTLY no puede correr dentro de una transacción: ejecutar cada sentencia por separado.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS gas_stations_city_trgm_idx
+    ON gas_stations USING gin (city gin_trgm_ops)
+    WHERE is_active = true;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS gas_stations_state_trgm_idx
+    ON gas_stations USING gin (state gin_trgm_ops)
+    WHERE is_active = true;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS gas_stations_brand_trgm_idx
+    ON gas_stations USING gin (brand gin_trgm_ops)
+    WHERE is_active = true;
+
+-- Verificar que el planner usa el índice trigram:
+-- EXPLAIN (ANALYZE, BUFFERS)
+-- SELECT id FROM gas_stations
+-- WHERE is_active = true AND city ILIKE '%guadalajara%';
\ No newline at end of file
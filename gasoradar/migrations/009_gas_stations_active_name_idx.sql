@@ -0,0 +1,18 @@
+-- Índice parcial para los listados sin coordenadas ni filtros de texto, que ordenan
+-- las gasolineras activas por nombre: el planner recorre el índice ya ordenado, sin Sort.
+-- Solo el listado legacy (get_gas_stations) puede cortar en el LIMIT; /gas-stations/
+-- calcula el total con count(*) OVER (), que lee todas las filas activas de todos modos.
+-- No es un índice cubriente (INCLUDE): el listado lee las columnas current_<combustible>_*
+-- que el trigger de 005 actualiza con cada precio; incluirlas impediría los updates HOT
+-- y el visibility map se ensuciaría igual, así que el heap se visitaría de todos modos.
+-- CONCURRENTLY no puede correr dentro de una transacción: ejecutar la sentencia por separado.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS gas_stations_active_name_idx
+    ON gas_stations (name)
+    WHERE is_active = true;
+
+-- Verificar que el planner usa el índice (Index Scan sin Sort):
+-- EXPLAIN (ANALYZE, BUFFERS)
+-- SELECT id, name FROM gas_stations
+-- WHERE is_active = true
+-- ORDER BY name LIMIT 50;
\ No newline at end of file